@@ -1,12 +1,26 @@
-import subprocess
-import time
-import os
-import shutil
 import math
 import random
-import copy
+from array import array
+from concurrent.futures import wait
 from tkinter import *
-from copy import deepcopy
+from tkinter import messagebox
+from tkinter import font as tkfont
+from rules import Game, PIECES
+from stockfish_ai import EngineError, HANDSHAKE_TIMEOUT, STOCKFISH_PATH, start_in_background
+from engine import BuiltinAI
+
+# --- Match state ---
+# The game on screen plus the UI state that belongs to it. Starting a game swaps in a new Match
+# instead of resetting a handful of globals; the engine itself is shared by all matches.
+class Match:
+    __slots__ = ('game', 'mode', 'selected', 'click_detection', 'ai_search')
+
+    def __init__(self, game, mode=None):
+        self.game = game
+        self.mode = mode              # 0 = against the AI, 1 = two players, None on the menus
+        self.selected = None          # (row, col) of the piece picked up, if any
+        self.click_detection = False  # whether board clicks are accepted
+        self.ai_search = None         # Future for the engine move being searched, None when idle
 
 # --- Globals ---
 color_schemes = [("#F3D294", "#796845"), ('#eeeed2', '#769656'), ("white", "black"), ("#D11500", "#000000")]
@@ -15,22 +29,13 @@ colors = [*color_schemes[0]]
 piece_color_schemes = [("#F3D294", "#796845"), ('#eeeed2', '#769656'), ("white", "black"), ("#D11500", "#000000")]
 current_piece_scheme = 2
 piece_colors = list(piece_color_schemes[2])
-piece_types = {0: 'P', 1: 'K', 2: 'Q', 3: 'B', 4: 'R', 5: 'N'}
-player_colors = {0: 'white', 1: 'black'}
 cell_size = 100
-selected = None
 custom_board = None
-king_moved = {0: False, 1: False}
-rook_moved = {0: {0: False, 7: False}, 1: {0: False, 7: False}}
-game_mode = None
+match = Match(Game())
 ai_depth = 12        # default depth
 ai_difficulty = "Medium"
-click_detection = False
 explosion_mode = "on_capture"
-explosions = [] 
 text_box = None
-move_history = []
-redo_stack = []
 
 UNICODE = {
     0: {0: '\u265F', 1: '\u265A', 2: '\u265B', 3: '\u265D', 4: '\u265C', 5: '\u265E'},  
@@ -55,276 +60,106 @@ ai_difficulty_button = None
 rematch_button = None
 home_button = None
 ai = None
+engine_startup = None   # Future for the engine being launched in the background
 button_frame = None
 
-STOCKFISH_PATH = "/opt/homebrew/bin/stockfish" 
-if not os.path.exists(STOCKFISH_PATH):
-    STOCKFISH_PATH = shutil.which("stockfish") or STOCKFISH_PATH
-
-
-# ---------- Board creation ----------
-def create_board():
-    board = [[False for _ in range(8)] for _ in range(8)]
-    if custom_board:
-        for xy, piece in custom_board:
-            r, c = xy
-            board[r][c] = piece
-        return board
-
-    # pawns
-    for player_id in player_colors:
-        row = 6 if player_id == 0 else 1
-        for i in range(8):
-            board[row][i] = (player_id, 0)  # pawn
-
-    # back rows
-    rows = {player_colors[0]: 7, player_colors[1]: 0}
-    for player_id, color_name in player_colors.items():
-        base = rows[color_name]
-        board[base][4] = (player_id, 1)  # king
-        board[base][3] = (player_id, 2)  # queen
-        for col in [2, 5]:
-            board[base][col] = (player_id, 3)  # bishops
-        for col in [0, 7]:
-            board[base][col] = (player_id, 4)  # rooks
-        for col in [1, 6]:
-            board[base][col] = (player_id, 5)  # knights
-    return board
-
-# ---------- Movement functions ----------
-def pawn_movement(sr, sc, player, board_ref):
-    possible_moves = []
-    moved = not ((player == 0 and sr == 6) or (player == 1 and sr == 1))
-    pawn_dir = -1 if player == 0 else 1
-    # forward
-    nr = sr + pawn_dir
-    if 0 <= nr <= 7 and not board_ref[nr][sc]:
-        possible_moves.append((nr, sc))
-        if not moved:
-            nr2 = sr + 2*pawn_dir
-            if 0 <= nr2 <= 7 and not board_ref[nr2][sc]:
-                possible_moves.append((nr2, sc))
-    # captures
-    for dc in (-1, 1):
-        nc = sc + dc
-        nr = sr + pawn_dir
-        if 0 <= nr <= 7 and 0 <= nc <= 7:
-            target = board_ref[nr][nc]
-            if target and target[0] != player:
-                possible_moves.append((nr, nc))
-    return possible_moves
-
-def king_movement(sr, sc, player, board_ref):
-    possible_moves = []
-    directions = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
-    for dr, dc in directions:
-        r, c = sr + dr, sc + dc
-        if 0 <= r <= 7 and 0 <= c <= 7:
-            target = board_ref[r][c]
-            if not target or target[0] != player:
-                possible_moves.append((r, c))
-
-    # castling
-    start_row = 7 if player == 0 else 0
-    if not king_moved[player] and sr == start_row and sc == 4:
-        # kingside
-        rook = board_ref[start_row][7]
-        if rook and rook[0] == player and not rook_moved[player][7]:
-            if not board_ref[start_row][5] and not board_ref[start_row][6]:
-                ok = True
-                for sc_step in (5, 6):
-                    temp = deepcopy(board_ref)
-                    temp[start_row][sc_step] = (player, 1)
-                    temp[start_row][4] = False
-                    if is_check_simulate(player, temp):
-                        ok = False
-                        break
-                if ok:
-                    possible_moves.append((start_row, 6))
-        # queenside
-        rook_q = board_ref[start_row][0]
-        if rook_q and rook_q[0] == player and not rook_moved[player][0]:
-            if not board_ref[start_row][1] and not board_ref[start_row][2] and not board_ref[start_row][3]:
-                ok = True
-                for sc_step in (3, 2):
-                    temp = deepcopy(board_ref)
-                    temp[start_row][sc_step] = (player, 1)
-                    temp[start_row][4] = False
-                    if is_check_simulate(player, temp):
-                        ok = False
-                        break
-                if ok:
-                    possible_moves.append((start_row, 2))
-    return possible_moves
-
-def bishop_movement(sr, sc, player, board_ref):
-    possible_moves = []
-    for dr, dc in [(-1, -1), (-1, 1), (1, -1), (1, 1)]:
-        r, c = sr+dr, sc+dc
-        while 0 <= r <= 7 and 0 <= c <= 7:
-            target = board_ref[r][c]
-            if not target:
-                possible_moves.append((r, c))
-            elif target[0] != player:
-                possible_moves.append((r, c)); break
-            else: break
-            r += dr; c += dc
-    return possible_moves
-
-def rook_movement(sr, sc, player, board_ref):
-    possible_moves = []
-    for dr, dc in [(-1,0),(1,0),(0,-1),(0,1)]:
-        r, c = sr+dr, sc+dc
-        while 0 <= r <= 7 and 0 <= c <= 7:
-            target = board_ref[r][c]
-            if not target:
-                possible_moves.append((r, c))
-            elif target[0] != player:
-                possible_moves.append((r, c)); break
-            else: break
-            r += dr; c += dc
-    return possible_moves
-
-def knight_movement(sr, sc, player, board_ref):
-    possible_moves = []
-    for dr, dc in [(-2,-1),(-2,1),(-1,-2),(-1,2),(1,-2),(1,2),(2,-1),(2,1)]:
-        r, c = sr+dr, sc+dc
-        if 0 <= r <=7 and 0 <= c <=7:
-            target = board_ref[r][c]
-            if not target or target[0] != player:
-                possible_moves.append((r, c))
-    return possible_moves
-
-def queen_movement(sr, sc, player, board_ref):
-    return rook_movement(sr, sc, player, board_ref) + bishop_movement(sr, sc, player, board_ref)
-
-# ---------- Check / legal move detection ----------
-def is_check_simulate(player, board_ref):
-    king_pos = None
-    for r in range(8):
-        for c in range(8):
-            piece = board_ref[r][c]
-            if piece and piece[0] == player and piece[1] == 1:
-                king_pos = (r, c)
-                break
-        if king_pos: break
-    if not king_pos:
-        return False
-    opponent = 1 - player
-    enemy_moves = []
-    for r in range(8):
-        for c in range(8):
-            piece = board_ref[r][c]
-            if piece and piece[0] == opponent:
-                pt = piece[1]
-                if pt == 0: moves = pawn_movement(r, c, opponent, board_ref)
-                elif pt == 1: moves = king_movement(r, c, opponent, board_ref)
-                elif pt == 2: moves = queen_movement(r, c, opponent, board_ref)
-                elif pt == 3: moves = bishop_movement(r, c, opponent, board_ref)
-                elif pt == 4: moves = rook_movement(r, c, opponent, board_ref)
-                elif pt == 5: moves = knight_movement(r, c, opponent, board_ref)
-                else: moves = []
-                enemy_moves.extend(moves)
-    return king_pos in enemy_moves
-
-def has_legal_moves(player, board_ref):
-    for r in range(8):
-        for c in range(8):
-            piece = board_ref[r][c]
-            if piece and piece[0] == player:
-                pt = piece[1]
-                if pt == 0: moves = pawn_movement(r, c, player, board_ref)
-                elif pt == 1: moves = king_movement(r, c, player, board_ref)
-                elif pt == 2: moves = queen_movement(r, c, player, board_ref)
-                elif pt == 3: moves = bishop_movement(r, c, player, board_ref)
-                elif pt == 4: moves = rook_movement(r, c, player, board_ref)
-                elif pt == 5: moves = knight_movement(r, c, player, board_ref)
-                else: moves = []
-                for er, ec in moves:
-                    temp = deepcopy(board_ref)
-                    temp[er][ec] = temp[r][c]
-                    temp[r][c] = False
-                    if not is_check_simulate(player, temp):
-                        return True
-    return False
-
-def checkmate():
-    global turn
-    current_player = turn
-    if not has_legal_moves(current_player, board):
-        if is_check_simulate(current_player, board):
-            if current_player == 0:
-                draw_black_wins()
-            else:
-                draw_white_wins()
-        else:
-            draw_stalemate()
-        return True
-    return False
-
-def insufficient_material():
-    piece_counts = {0: [], 1: []}  # list of piece types per player
-
-    for r in range(8):
-        for c in range(8):
-            piece = board[r][c]
-            if piece:
-                player, p_type = piece
-                piece_counts[player].append(p_type)
-
-    for player in [0, 1]:
-        # remove king from counts
-        piece_counts[player] = [p for p in piece_counts[player] if p != 1]
-
-    # if both sides have no pawns, rooks, queens
-    # and only minor pieces: 0 = pawn, 1 = king, 2 = knight, 3 = bishop, 4 = rook, 5 = queen
-    minor_pieces = [2, 3]
-    
-    for player in [0, 1]:
-        for p in piece_counts[player]:
-            if p not in minor_pieces:
-                return False  # there is a major piece → checkmate still possible
-
-    # now check for specific cases
-    p0 = piece_counts[0]
-    p1 = piece_counts[1]
-
-    # King vs King
-    if len(p0) == 0 and len(p1) == 0:
-        return True
-    # King + minor vs King
-    if (len(p0) == 1 and len(p1) == 0) or (len(p1) == 1 and len(p0) == 0):
-        return True
-    # King + minor vs King + minor (only minor pieces, any combination)
-    if len(p0) <= 1 and len(p1) <= 1:
-        return True
-
-    return False
 
 # ---------- Drawing ----------
-def draw_board():
+# The canvas keeps one rectangle, one highlight dot and one set of glyph items per square for the
+# whole session; draw_board only reconfigures the squares whose look changed since the last call.
+square_items = {}     # (r, c) -> rectangle id
+highlight_items = {}  # (r, c) -> oval id
+piece_items = {}      # (r, c) -> [outline text ids..., fill text id]
+drawn_squares = {}    # (r, c) -> (square color, highlighted, piece look) currently shown
+drawn_cell_size = None
+drawn_text_box = None
+drawn_state = None
+
+# Pieces are drawn as a glyph over four offset copies that form its outline. Plain Tk cannot
+# rasterize text into a PhotoImage, so that stays five text items per square; what is shared is
+# the Font object, one per cell size instead of a font description parsed per item.
+piece_fonts = {}  # cell_size -> Font shared by all glyph items of that size
+
+def piece_font():
+    font = piece_fonts.get(cell_size)
+    if font is None:
+        font = piece_fonts[cell_size] = tkfont.Font(family="Arial", size=cell_size, weight="bold")
+    return font
+
+def piece_look(code):
+    # code is the board byte for a square, 0 when empty -> (glyph, outline color, fill color)
+    if not code:
+        return None
+    piece = PIECES[code]
+    fill = piece_colors[piece[0]]
+    outline = 'white' if fill == 'black' else 'black'
+    return UNICODE[piece[0]][piece[1]], outline, fill
+
+def build_canvas():
+    global drawn_cell_size, drawn_text_box, drawn_state
     canvas.delete("all")
+    clear_explosions()
+    square_items.clear()
+    highlight_items.clear()
+    piece_items.clear()
+    drawn_squares.clear()
+    font = piece_font()
+    radius = cell_size/4
     for r in range(8):
         for c in range(8):
-            color = colors[(r+c)%2]
-            canvas.create_rectangle(c*cell_size, r*cell_size, (c+1)*cell_size, (r+1)*cell_size, fill=color, outline="black")
-    if selected:
-        highlight_options(selected)
+            square_items[(r, c)] = canvas.create_rectangle(c*cell_size, r*cell_size, (c+1)*cell_size, (r+1)*cell_size, outline="black")
+            cx = c*cell_size + cell_size/2
+            cy = r*cell_size + cell_size/2
+            highlight_items[(r, c)] = canvas.create_oval(cx-radius, cy-radius, cx+radius, cy+radius, fill='gray', outline='', state='hidden')
     for r in range(8):
         for c in range(8):
-            if board[r][c]:
-                pid, ptype = board[r][c]
-                glyph = UNICODE[pid][ptype]
-                cx = c*cell_size + cell_size/2
-                cy = r*cell_size + cell_size/2
-                font = ("Arial", cell_size, "bold")
-                outline = 'white' if piece_colors[pid] == 'black' else 'black'
-                for dx in (-1,1):
-                    for dy in (-1,1):
-                        canvas.create_text(cx+dx, cy+dy, text=glyph, font=font, fill=outline)
-                canvas.create_text(cx, cy, text=glyph, font=font, fill=piece_colors[pid])
-    
-    create_text_box()
+            cx = c*cell_size + cell_size/2
+            cy = r*cell_size + cell_size/2
+            items = [canvas.create_text(cx+dx, cy+dy, text='', font=font) for dx in (-1,1) for dy in (-1,1)]
+            items.append(canvas.create_text(cx, cy, text='', font=font))
+            piece_items[(r, c)] = items
+    drawn_cell_size = cell_size
+    drawn_text_box = None
+    drawn_state = None
+
+def update_square(r, c, look):
+    fill, highlighted, piece = look
+    old = drawn_squares.get((r, c))
+    if old is None or old[0] != fill:
+        canvas.itemconfig(square_items[(r, c)], fill=fill)
+    if old is None or old[1] != highlighted:
+        canvas.itemconfig(highlight_items[(r, c)], state='normal' if highlighted else 'hidden')
+    if old is None or old[2] != piece:
+        items = piece_items[(r, c)]
+        if piece:
+            glyph, outline, piece_fill = piece
+            for item in items[:-1]:
+                canvas.itemconfig(item, text=glyph, fill=outline)
+            canvas.itemconfig(items[-1], text=glyph, fill=piece_fill)
+        else:
+            for item in items:
+                canvas.itemconfig(item, text='')
+    drawn_squares[(r, c)] = look
+
+def draw_board():
+    global drawn_state, drawn_text_box
+    if drawn_cell_size != cell_size:
+        build_canvas()
+    state = (match.game.key, match.selected, tuple(colors), tuple(piece_colors))
+    if state != drawn_state:
+        drawn_state = state
+        targets = highlight_options(match.selected)
+        board = match.game.board
+        for r in range(8):
+            for c in range(8):
+                look = (colors[(r+c)%2], (r, c) in targets, piece_look(board[r*8 + c]))
+                if drawn_squares.get((r, c)) != look:
+                    update_square(r, c, look)
+    if text_box != drawn_text_box:
+        canvas.delete("text_box")
+        create_text_box()
+        canvas.tag_raise("explosion")
+        drawn_text_box = text_box
 
 def create_text_box():
     if text_box == "chess":
@@ -335,66 +170,115 @@ def create_text_box():
         # Draw title with shadow
         for dx in (-1, 1):
             for dy in (-1, 1):
-                canvas.create_text(title_x + dx, title_y + dy, text="Chess", font=("Arial", title_font_size, "bold"), fill="#000000")
-        canvas.create_text(title_x, title_y, text="Chess", font=("Arial", title_font_size, "bold"), fill="#FFFFFF")
+                canvas.create_text(title_x + dx, title_y + dy, text="Chess", font=("Arial", title_font_size, "bold"), fill="#000000", tags="text_box")
+        canvas.create_text(title_x, title_y, text="Chess", font=("Arial", title_font_size, "bold"), fill="#FFFFFF", tags="text_box")
     elif text_box == "white wins":
         for dx in (-1, 1):
             for dy in (-1, 1):
-                canvas.create_text(8*cell_size//2 + dx, 4*cell_size//2 + dy, text="White Wins!", font=("Arial", cell_size, "bold"), fill="#000000")
-        canvas.create_text(8*cell_size//2, 4*cell_size//2, text="White Wins!", font=("Arial", cell_size, "bold"), fill="#FFFFFF")  
+                canvas.create_text(8*cell_size//2 + dx, 4*cell_size//2 + dy, text="White Wins!", font=("Arial", cell_size, "bold"), fill="#000000", tags="text_box")
+        canvas.create_text(8*cell_size//2, 4*cell_size//2, text="White Wins!", font=("Arial", cell_size, "bold"), fill="#FFFFFF", tags="text_box")  
     elif text_box == "black wins":
         for dx in (-1, 1):
             for dy in (-1, 1):
-                canvas.create_text(8*cell_size//2 + dx, 4*cell_size//2 + dy, text="Black Wins!", font=("Arial", cell_size, "bold"), fill="#FFFFFF")
-        canvas.create_text(8*cell_size//2, 4*cell_size//2, text="Black Wins!", font=("Arial", cell_size, "bold"), fill="#000000")
+                canvas.create_text(8*cell_size//2 + dx, 4*cell_size//2 + dy, text="Black Wins!", font=("Arial", cell_size, "bold"), fill="#FFFFFF", tags="text_box")
+        canvas.create_text(8*cell_size//2, 4*cell_size//2, text="Black Wins!", font=("Arial", cell_size, "bold"), fill="#000000", tags="text_box")
     elif text_box == "stalemate":
         for dx in (-1, 1):
             for dy in (-1, 1):
-                canvas.create_text(8*cell_size//2 + dx, 4*cell_size//2 + dy, text="Stalemate!", font=("Arial", cell_size, "bold"), fill="#000000")
-        canvas.create_text(8*cell_size//2, 4*cell_size//2, text="Stalemate!", font=("Arial", cell_size, "bold"), fill="#FFFFFF")
+                canvas.create_text(8*cell_size//2 + dx, 4*cell_size//2 + dy, text="Stalemate!", font=("Arial", cell_size, "bold"), fill="#000000", tags="text_box")
+        canvas.create_text(8*cell_size//2, 4*cell_size//2, text="Stalemate!", font=("Arial", cell_size, "bold"), fill="#FFFFFF", tags="text_box")
+    elif text_box == "draw":
+        for dx in (-1, 1):
+            for dy in (-1, 1):
+                canvas.create_text(8*cell_size//2 + dx, 4*cell_size//2 + dy, text="Draw!", font=("Arial", cell_size, "bold"), fill="#000000", tags="text_box")
+        canvas.create_text(8*cell_size//2, 4*cell_size//2, text="Draw!", font=("Arial", cell_size, "bold"), fill="#FFFFFF", tags="text_box")
         
+# Live particles of every explosion are stored in parallel arrays (one slot per particle) and
+# drawn with a pool of oval items that are moved and recolored instead of recreated each frame.
+particle_x = array('d')
+particle_y = array('d')
+particle_dx = array('d')
+particle_dy = array('d')
+particle_size = array('d')
+particle_alpha = array('d')
+particle_fade = array('d')  # alpha lost per frame, 1 / duration
+particle_arrays = (particle_x, particle_y, particle_dx, particle_dy, particle_size, particle_alpha, particle_fade)
+particle_items = []         # pooled oval ids; the first len(particle_x) are visible
+shown_particles = 0
+FADE_COLORS = [f'#ff{i:02x}00' for i in range(256)]  # fading orange by alpha
+
 def create_explosion(row, col, duration=20, max_radius=30):
     x0 = col * cell_size + cell_size // 2
     y0 = row * cell_size + cell_size // 2
-    particles = []
 
     for _ in range(10):  # number of particles
         angle = random.uniform(0, 2 * 3.14159)
         speed = random.uniform(2, 6)
-        dx = speed * math.cos(angle)
-        dy = speed * math.sin(angle)
-        size = random.randint(4, 8)
-        particles.append({'x': x0, 'y': y0, 'dx': dx, 'dy': dy, 'size': size, 'alpha': 1.0})
-
-    explosions.append({'particles': particles, 'frame': 0, 'duration': duration})
+        particle_x.append(x0)
+        particle_y.append(y0)
+        particle_dx.append(speed * math.cos(angle))
+        particle_dy.append(speed * math.sin(angle))
+        particle_size.append(random.randint(4, 8))
+        particle_alpha.append(1.0)
+        particle_fade.append(1 / duration)
+    while len(particle_items) < len(particle_x):
+        particle_items.append(canvas.create_oval(0, 0, 0, 0, outline='', state='hidden', tags="explosion"))
+    canvas.tag_raise("explosion")
+    request_frame()
+
+def clear_explosions():
+    global shown_particles
+    for values in particle_arrays:
+        del values[:]
+    particle_items.clear()  # the canvas items themselves go with canvas.delete("all")
+    shown_particles = 0
 
 def update_explosions():
-
-    for explosion in explosions[:]:
-        for p in explosion['particles']:
-            p['x'] += p['dx']
-            p['y'] += p['dy']
-            p['alpha'] -= 1 / explosion['duration']
-        explosion['frame'] += 1
-
-        # Draw each particle
-        for p in explosion['particles']:
-            if p['alpha'] > 0:
-                color = f'#ff{int(255 * p["alpha"]):02x}00'  # fading orange
-                canvas.create_oval(
-                    p['x'] - p['size'], p['y'] - p['size'],
-                    p['x'] + p['size'], p['y'] + p['size'],
-                    fill=color, outline=''
-                )
-
-        # Remove explosion after duration
-        if explosion['frame'] >= explosion['duration']:
-            explosions.remove(explosion)
+    global shown_particles
+    # advance every particle in one pass, compacting the survivors to the front of the arrays
+    live = 0
+    for i in range(len(particle_x)):
+        alpha = particle_alpha[i] - particle_fade[i]
+        if alpha <= 1e-9:
+            continue
+        x = particle_x[i] + particle_dx[i]
+        y = particle_y[i] + particle_dy[i]
+        size = particle_size[i]
+        if live != i:
+            for values in particle_arrays:
+                values[live] = values[i]
+        particle_x[live] = x
+        particle_y[live] = y
+        particle_alpha[live] = alpha
+        item = particle_items[live]
+        canvas.coords(item, x - size, y - size, x + size, y + size)
+        if live >= shown_particles:  # pool item coming out of hiding
+            canvas.itemconfig(item, fill=FADE_COLORS[int(255 * alpha)], state='normal')
+        else:
+            canvas.itemconfig(item, fill=FADE_COLORS[int(255 * alpha)])
+        live += 1
+    for values in particle_arrays:
+        del values[live:]
+    for item in particle_items[live:shown_particles]:
+        canvas.itemconfig(item, state='hidden')
+    shown_particles = live
+
+# Frames only run while something is moving: an explosion in flight or a redraw requested by an
+# input/engine event. With nothing to animate the loop stops and the board costs no CPU.
+frame_job = None
+
+def request_frame():
+    global frame_job
+    if frame_job is None:
+        frame_job = window.after_idle(animate)
 
 def animate():
+    global frame_job
+    frame_job = None
     draw_board()          # redraw the board
     update_explosions()   # draw explosions on top
-    window.after(30, animate)  # call again after 30ms
+    if particle_x:
+        frame_job = window.after(30, animate)  # call again after 30ms
 
 # ---------- Promotion overlay ----------
 def prompt_promotion(er, ec, player):
@@ -413,14 +297,15 @@ def prompt_promotion(er, ec, player):
     top.geometry(f"{w}x{h}+{x}+{y}")
     frame = Frame(top)
     frame.pack(expand=True, fill="both", padx=10, pady=8)
+    choice = [2]  # queen if the dialog is closed without picking
     def do_promote(pt):
-        board[er][ec] = (player, pt)
+        choice[0] = pt
         top.destroy()
-        draw_board()
     for idx, (name, pt) in enumerate(choices):
         b = Button(frame, text=glyphs[player][pt], font=("Arial", 20), command=lambda p=pt: do_promote(p))
         b.grid(row=0, column=idx, padx=6)
     window.wait_window(top)
+    return choice[0]
 
 # ---------- Game Utilities ----------
 
@@ -438,466 +323,228 @@ def in_game_options():
     resign_button = Button(button_frame, text="Resign", command=resign_game, width=int(cell_size//5), height=int(cell_size//30), font=("Arial", cell_size//5, "bold"))
     resign_button.grid(row=0, column=2, padx=5)
 
-def save_board_state():
-    move_history.append((copy.deepcopy(board), turn, copy.deepcopy(king_moved), copy.deepcopy(rook_moved)))
-    redo_stack.clear()  # clear redo history whenever a new move happens
-
 def undo_move():
-    global board, turn, king_moved, rook_moved
-    if not move_history:
+    game = match.game
+    if cancel_ai_search():
+        match.click_detection = True  # taking back a move while the AI is thinking
+    if not match.click_detection or not game.undo():
         return
-
-    # save current state to redo stack
-    redo_stack.append((copy.deepcopy(board), turn, copy.deepcopy(king_moved), copy.deepcopy(rook_moved)))
-
-    # revert to last saved state
-    board, turn, king_moved, rook_moved = move_history.pop()
+    # against the AI, step back to the human's turn
+    while match.mode == 0 and game.turn == 1 and game.undo():
+        pass
+    match.selected = None
     draw_board()
+    resume_ai_turn()
 
 def redo_move():
-    global board, turn, king_moved, rook_moved
-    if not redo_stack:
+    game = match.game
+    if not match.click_detection:
+        return
+    if not game.redo():
         messagebox.showinfo("Redo", "No moves to redo.")
         return
-
-    # save current state to undo stack
-    move_history.append((copy.deepcopy(board), turn, copy.deepcopy(king_moved), copy.deepcopy(rook_moved)))
-
-    # load next state
-    board, turn, king_moved, rook_moved = redo_stack.pop()
+    while match.mode == 0 and game.turn == 1 and game.redo():
+        pass
+    match.selected = None
     draw_board()
+    resume_ai_turn()
+
+def resume_ai_turn():
+    # undo/redo can stop on the AI's turn (a move taken back mid-search leaves only the human's
+    # half of the pair to redo); hand the move to the engine instead of to the clicks
+    if match.mode == 0 and match.game.turn == 1 and (engine_ready() or engine_startup):
+        match.click_detection = False
+        window.after(200, run_ai_move)
 
 def resign_game():
-    global turn
-    if turn % 2 == 0:
+    cancel_ai_search()
+    # against the AI it is always the human (white) resigning, even while the engine is to move
+    if match.mode == 0 or match.game.turn == 0:
         draw_black_wins()
     else:
-        draw_white_wins
+        draw_white_wins()
 
 # ---------- Win UI ----------
 def draw_white_wins():
-    global board, click_detection, text_box, button_frame
+    global text_box, button_frame
     if button_frame is not None:
         button_frame.destroy()
         button_frame = None
-    board = create_board()
-    click_detection = False
+    match.game.reset()
+    match.click_detection = False
     text_box = "white wins"
     create_rematch_button()
 
 def draw_black_wins():
-    global board, click_detection, text_box, button_frame
+    global text_box, button_frame
     if button_frame is not None:
         button_frame.destroy()
         button_frame = None
-    board = create_board()
-    click_detection = False
+    match.game.reset()
+    match.click_detection = False
     text_box = "black wins"
     create_rematch_button()
 
 def draw_stalemate():
-    global board, click_detection, text_box, button_frame
+    global text_box, button_frame
     if button_frame is not None:
         button_frame.destroy()
         button_frame = None
-    board = create_board()
-    click_detection = False
+    match.game.reset()
+    match.click_detection = False
     text_box = "stalemate"
     create_rematch_button()
 
+def draw_drawn_game():
+    # repetition, fifty-move rule or insufficient material
+    global text_box, button_frame
+    if button_frame is not None:
+        button_frame.destroy()
+        button_frame = None
+    match.game.reset()
+    match.click_detection = False
+    text_box = "draw"
+    create_rematch_button()
+
 def create_rematch_button():
     global rematch_button, home_button
     home_button = Button(window, text="Title Screen", font=("Arial", cell_size//3), command=start_screen)
     rematch_button = Button(window, text="Rematch", font=("Arial", cell_size//3), command=rematch)
     home_button.place(relx=0.5, y=4*cell_size//2 + cell_size, anchor="n", width=cell_size*3, height=cell_size*0.85)
     rematch_button.place(relx=0.5, y=4*cell_size//2 + 2 * cell_size, anchor="n", width=cell_size*3, height=cell_size*0.85)
+    request_frame()
 
 def rematch():
-    global board, turn, selected, king_moved, rook_moved, ai, click_detection, text_box, redo_stack, move_history
+    global text_box
     for w in window.winfo_children():
         if isinstance(w, Button):
             w.destroy()
-    click_detection = True
+    match.click_detection = True
     text_box = None
     in_game_options()
-    move_history = []
-    redo_stack = []
-    turn = 0
-    selected = None
-    king_moved = {0: False, 1: False}
-    rook_moved = {0: {0: False, 7: False}, 1: {0: False, 7: False}}
-    board = create_board()
+    match.selected = None
+    cancel_ai_search()
+    match.game.reset()
     if ai:
-        # keep engine running; no change
-        pass
-    canvas.delete("all")
+        ai.new_game()
     draw_board()
 
 # ---------- Highlight legal options ----------
 def highlight_options(selected_piece):
+    # squares that get a move dot
     if not selected_piece:
-        return
+        return set()
     row, col = selected_piece
-    piece = board[row][col]
-    if not piece: return
-    piece_type, player = piece[1], piece[0]
-    if piece_type == 0: possible_moves = pawn_movement(row, col, player, board)
-    elif piece_type == 1: possible_moves = king_movement(row, col, player, board)
-    elif piece_type == 2: possible_moves = queen_movement(row, col, player, board)
-    elif piece_type == 3: possible_moves = bishop_movement(row, col, player, board)
-    elif piece_type == 4: possible_moves = rook_movement(row, col, player, board)
-    elif piece_type == 5: possible_moves = knight_movement(row, col, player, board)
-    else: possible_moves = []
-    legal_moves = []
-    for r, c in possible_moves:
-        temp = deepcopy(board)
-        temp[r][c] = temp[row][col]
-        temp[row][col] = False
-        if not is_check_simulate(player, temp):
-            legal_moves.append((r, c))
-    for r, c in legal_moves:
-        cx = c*cell_size + cell_size/2
-        cy = r*cell_size + cell_size/2
-        radius = cell_size/4
-        canvas.create_oval(cx-radius, cy-radius, cx+radius, cy+radius, fill='gray', outline='')
+    return set(match.game.legal_targets(row, col))
 
 # ---------- Input and execution ----------
+def checkmate():
+    status = match.game.status()
+    if status is None:
+        return False
+    cancel_ai_search()  # a ponder search has no time limit; don't let it run on the result screen
+    if status == 'checkmate':
+        if match.game.turn == 0:
+            draw_black_wins()
+        else:
+            draw_white_wins()
+    elif status == 'stalemate':
+        draw_stalemate()
+    else:
+        draw_drawn_game()
+    return True
+
 def on_click(event):
-    global selected, turn, king_moved, rook_moved, click_detection
-    if click_detection:
+    game = match.game
+    if match.click_detection:
         row = event.y // cell_size
         col = event.x // cell_size
-        target_piece = board[row][col]
         if not (0 <= row <= 7 and 0 <= col <= 7): 
             return
-        piece = board[row][col]
-        if piece and piece[0] == turn and not selected:
-            selected = (row, col)
+        piece = game.piece_at(row, col)
+        if piece and piece[0] == game.turn and not match.selected:
+            match.selected = (row, col)
             draw_board()
             return
-        if selected:
-            sr, sc = selected
-            if check_valid(sr, sc, row, col) and not is_check(sr, sc, row, col):
-                save_board_state()
-                moving = board[sr][sc]
-                moving_player, moving_type = moving[0], moving[1]
-
-                board[row][col] = moving
-                board[sr][sc] = False
-
-                # handle castling
-                if moving_type == 1 and abs(col - sc) == 2:
-                    kr = row
-                    if col == 6:  # kingside
-                        board[kr][5] = board[kr][7]
-                        board[kr][7] = False
-                        rook_moved[moving_player][7] = True
-                    elif col == 2:  # queenside
-                        board[kr][3] = board[kr][0]
-                        board[kr][0] = False
-                        rook_moved[moving_player][0] = True
-
-                # update moved flags
-                if moving_type == 1:
-                    king_moved[moving_player] = True
-                if moving_type == 4:
-                    if (sr, sc) == (7 if moving_player == 0 else 0, 0):
-                        rook_moved[moving_player][0] = True
-                    if (sr, sc) == (7 if moving_player == 0 else 0, 7):
-                        rook_moved[moving_player][7] = True
-
-                selected = None
-
-                if moving_type == 0 and (row == 0 or row == 7):
-                    prompt_promotion(row, col, moving_player)
-
-                turn = 1 - turn
+        if match.selected:
+            sr, sc = match.selected
+            if game.is_legal(sr, sc, row, col):
+                promotion = None
+                if game.is_promotion(sr, sc, row):
+                    promotion = prompt_promotion(row, col, game.turn)
+                target_piece = game.play(sr, sc, row, col, promotion)
+
+                match.selected = None
                 draw_board()   
 
                 if explosion_mode == "always" or (explosion_mode == "on_capture" and target_piece):  # there is a piece to capture
                     create_explosion(row, col)
                 
-                if game_mode == 0 and turn == 1 and ai and ai.engine_alive():
-                    click_detection = False
-                    # schedule AI move after 150ms
-                    window.after(200, run_ai_move)
-
                 if checkmate():
                     return
-                elif insufficient_material():
-                    draw_stalemate()
-                    return
+
+                if match.mode == 0 and game.turn == 1 and (engine_ready() or engine_startup):
+                    match.click_detection = False
+                    # schedule AI move after 150ms
+                    window.after(200, run_ai_move)
             else:
-                selected = None
+                match.selected = None
         draw_board()
 
 def run_ai_move():
-    global turn, click_detection
-    ai_move = ai.get_ai_move(board, turn_char='b')
+    if match.click_detection or match.game.turn != 1 or match.ai_search is not None:
+        return  # game ended or was reset while the move was scheduled
+    if engine_ready() is None:
+        if engine_startup is not None:
+            window.after(50, run_ai_move)  # still warming up
+        else:
+            match.click_detection = True  # no engine at all; hand the board back
+        return
+    # the engine searches on its own thread; poll for the answer so the window keeps running
+    match.ai_search = ai.start_search(match.game)
+    window.after(20, poll_ai_move, match.ai_search)
+
+def poll_ai_move(search):
+    if search is not match.ai_search:
+        return  # cancelled by undo, resign or a new game
+    if not search.done():
+        window.after(20, poll_ai_move, search)
+        return
+    match.ai_search = None
+    try:
+        ai_move = search.result()
+    except EngineError as e:
+        print(f"[ERROR] Stockfish: {e}")
+        if not ai.can_restart():
+            print("[INFO] Stockfish keeps failing, switching to the built-in engine.")
+            use_builtin_engine()
+        run_ai_move()  # respawns the engine (or uses the built-in one) and searches again
+        return
     if ai_move:
         move_piece_from_notation(ai_move)
-        turn = 1 - turn
         draw_board()
-    click_detection = True
+    match.click_detection = True
     if checkmate():
         return
+    if ai_move:
+        ai.start_ponder(match.game)  # think on the player's time
 
-def check_valid(sr, sc, er, ec, board_ref=None, player=None):
-    if board_ref is None: board_ref = board
-    if player is None: player = turn
-    if not board_ref[sr][sc]: return False
-    piece_type = board_ref[sr][sc][1]
-    if piece_type == 0: possible_moves = pawn_movement(sr, sc, player, board_ref)
-    elif piece_type == 1: possible_moves = king_movement(sr, sc, player, board_ref)
-    elif piece_type == 2: possible_moves = queen_movement(sr, sc, player, board_ref)
-    elif piece_type == 3: possible_moves = bishop_movement(sr, sc, player, board_ref)
-    elif piece_type == 4: possible_moves = rook_movement(sr, sc, player, board_ref)
-    elif piece_type == 5: possible_moves = knight_movement(sr, sc, player, board_ref)
-    else: possible_moves = []
-    if (er, ec) not in possible_moves: return False
-    # simulate and ensure not leaving king in check
-    temp = deepcopy(board_ref)
-    temp[er][ec] = temp[sr][sc]
-    temp[sr][sc] = False
-    return not is_check_simulate(player, temp)
-
-def is_check(sr, sc, er, ec):
-    temp_board = deepcopy(board)
-    temp_board[er][ec] = temp_board[sr][sc]
-    temp_board[sr][sc] = False
-    # find king for current turn
-    king_pos = None
-    for r in range(8):
-        for c in range(8):
-            piece = temp_board[r][c]
-            if piece and piece[0] == turn and piece[1] == 1:
-                king_pos = (r, c)
-                break
-        if king_pos: break
-    if not king_pos:
-        return False
-    opponent = 1 - turn
-    enemy_moves = []
-    for r in range(8):
-        for c in range(8):
-            piece = temp_board[r][c]
-            if piece and piece[0] == opponent:
-                pt = piece[1]
-                if pt == 0: moves = pawn_movement(r, c, opponent, temp_board)
-                elif pt == 1: moves = king_movement(r, c, opponent, temp_board)
-                elif pt == 2: moves = queen_movement(r, c, opponent, temp_board)
-                elif pt == 3: moves = bishop_movement(r, c, opponent, temp_board)
-                elif pt == 4: moves = rook_movement(r, c, opponent, temp_board)
-                elif pt == 5: moves = knight_movement(r, c, opponent, temp_board)
-                else: moves = []
-                enemy_moves.extend(moves)
-    return king_pos in enemy_moves
-
-# ---------- Stockfish integration ----------
-class StockfishAI:
-    def __init__(self, difficulty="Medium", path=STOCKFISH_PATH):
-        self.path = path
-        self.proc = None
-        self.difficulty = difficulty
-        self.depth = 8  # default, will be overridden
-        if not self.path or not os.path.exists(self.path):
-            found = shutil.which("stockfish")
-            if found:
-                self.path = found
-        try:
-            self.proc = subprocess.Popen(
-                [self.path],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True,
-                bufsize=1
-            )
-            self.send_command("uci")
-            while True:
-                line = self.proc.stdout.readline().strip()
-                if line == "uciok":
-                    break
-            self.send_command("isready")
-            while True:
-                line = self.proc.stdout.readline().strip()
-                if line == "readyok":
-                    break
-            # set initial difficulty
-            self.set_difficulty(difficulty)
-        except Exception as e:
-            print("Stockfish start error:", e)
-            self.proc = None
-
-    def engine_alive(self):
-        return self.proc is not None and self.proc.poll() is None
-
-    def send_command(self, cmd):
-        if not self.engine_alive(): return
-        try:
-            self.proc.stdin.write(cmd + "\n")
-            self.proc.stdin.flush()
-        except Exception:
-            pass
-
-    def get_response(self):
-        if not self.engine_alive(): return None
-        while True:
-            line = self.proc.stdout.readline()
-            if not line:
-                continue
-            line = line.strip()
-            if line.startswith("bestmove"):
-                parts = line.split()
-                if len(parts) >= 2:
-                    return parts[1]
-                return None
-
-    def board_to_fen(self, board_ref, turn_char='w', en_passant='-', halfmove=0, fullmove=1):
-        piece_map = {
-            (0, 0): 'P', (0, 1): 'K', (0, 2): 'Q', (0, 3): 'B', (0, 4): 'R', (0, 5): 'N',
-            (1, 0): 'p', (1, 1): 'k', (1, 2): 'q', (1, 3): 'b', (1, 4): 'r', (1, 5): 'n'
-        }
-
-        fen_rows = []
-        for row in board_ref:
-            empty = 0
-            fen_row = ''
-            for cell in row:
-                if not cell:
-                    empty += 1
-                else:
-                    if empty:
-                        fen_row += str(empty)
-                        empty = 0
-                    fen_row += piece_map.get(cell, '?')
-            if empty:
-                fen_row += str(empty)
-            fen_rows.append(fen_row)
-        fen_board = '/'.join(fen_rows)
-
-        # --- FIXED CASTLING LOGIC ---
-        castling = ''
-        if not king_moved[0]:
-            if not rook_moved[0][7]: castling += 'K'
-            if not rook_moved[0][0]: castling += 'Q'
-        if not king_moved[1]:
-            if not rook_moved[1][7]: castling += 'k'
-            if not rook_moved[1][0]: castling += 'q'
-        if castling == '':
-            castling = '-'
-
-        # --- NEW: Flip board for Stockfish perspective (rank 8 = top) ---
-        fen_board = '/'.join(fen_rows)
-
-        return f"{fen_board} {turn_char} {castling} {en_passant} {halfmove} {fullmove}"
-
-    def get_ai_move(self, board_ref, turn_char='b'):
-        if not self.engine_alive(): return None
-        fen = self.board_to_fen(board_ref, turn_char)
-        self.send_command(f"position fen {fen}")
-        self.send_command(f"go depth {self.depth}")
-        return self.get_response()
-
-    def set_difficulty(self, level):
-        if not self.engine_alive():
-            return
-
-        self.difficulty = level
-        self.send_command("setoption name UCI_LimitStrength value true")  # enable skill limiting
-
-        if level == "Easy":
-            self.send_command("setoption name Skill Level value 4")  # weak
-            self.depth = 4
-        elif level == "Medium":
-            self.send_command("setoption name Skill Level value 8")  # moderate
-            self.depth = 8
-        elif level == "Hard":
-            self.send_command("setoption name Skill Level value 20")  # strong
-            self.depth = 20
-
-    def quit(self):
-        if not self.engine_alive(): return
-        try:
-            self.send_command("quit")
-            time.sleep(0.05)
-            if self.proc:
-                self.proc.terminate()
-        except Exception:
-            pass
-        self.proc = None
+def cancel_ai_search():
+    # drop the pending engine move (and any pondering); the engine's late reply is ignored
+    pending = match.ai_search is not None
+    match.ai_search = None
+    if ai:
+        ai.stop()
+    return pending
 
 # ---------- Move application helpers ----------
-def algebraic_to_coords(square):
-    # 'a1' -> (7,0), 'e2' -> (6,4) etc. (rank 1 is bottom row -> index 7)
-    if len(square) != 2: return None
-    file = square[0]
-    rank = square[1]
-    c = ord(file) - ord('a')
-    r = 8 - int(rank)
-    return (r, c)
-
 def move_piece_from_notation(move_str):
-
-    global board, king_moved, rook_moved
-    if not move_str or len(move_str) < 4: return
-    src_sq = move_str[0:2]
-    dst_sq = move_str[2:4]
-    src = algebraic_to_coords(src_sq)
-    dst = algebraic_to_coords(dst_sq)
-    if not src or not dst: return
-    sr, sc = src; er, ec = dst
-    piece = board[sr][sc]
-    if not piece:
-        # nothing to move (engine and internal board out-of-sync)
+    applied = match.game.play_uci(move_str)
+    if not applied:
         return
-    player, ptype = piece[0], piece[1]
-
-    # Promotion handling (if provided)
-    promotion = None
-    if len(move_str) == 5:
-        prom_char = move_str[4].lower()
-        mapping = {'q': 2, 'r': 4, 'b': 3, 'n': 5}
-        promotion = mapping.get(prom_char)
-
-    # Execute move
-    target_piece = board[er][ec]
-    board[er][ec] = board[sr][sc]
-    board[sr][sc] = False
-
-    # Castling: detect if king moved two squares; move corresponding rook
-    if ptype == 1 and abs(ec - sc) == 2:
-        # kingside
-        if ec == 6:
-            board[er][5] = board[er][7]
-            board[er][7] = False
-            rook_moved[player][7] = True
-        # queenside
-        elif ec == 2:
-            board[er][3] = board[er][0]
-            board[er][0] = False
-            rook_moved[player][0] = True
-
-    # update flags
-    if ptype == 1:
-        king_moved[player] = True
-    if ptype == 4:
-        if (sr, sc) == (7 if player == 0 else 0, 0):
-            rook_moved[player][0] = True
-        if (sr, sc) == (7 if player == 0 else 0, 7):
-            rook_moved[player][7] = True
-
+    er, ec, target_piece = applied
     if explosion_mode == "always" or (explosion_mode == "on_capture" and target_piece):
         create_explosion(er, ec)
-    
-    # Apply promotion if any
-    if promotion is not None:
-        board[er][ec] = (player, promotion)
-
-def sync_stockfish():
-    if StockfishAI is not None:
-        fen = board_to_fen(board)
-        StockfishAI.set_fen_position(fen)
 
 # ---------- Options & screens ----------
 def change_color_scheme():
@@ -949,7 +596,6 @@ def options():
 
     clear_buttons()
     canvas.config(width=8*cell_size, height=8*cell_size)
-    canvas.delete("all")
     draw_board()
 
     back_button = Button(window, text="Back", font=("Arial", cell_size//3), command=start_screen)
@@ -977,17 +623,17 @@ def clear_buttons():
             globals()[btn_name] = None
 
 def start_screen():
-    global one_player_button, two_player_button, options_button, board, click_detection, text_box, button_frame
+    global one_player_button, two_player_button, options_button, match, text_box, button_frame
     if button_frame is not None:
         button_frame.destroy()
         button_frame = None
     clear_buttons()
     canvas.config(width=8*cell_size, height=8*cell_size)
-    canvas.delete("all")
-    board = create_board()
-    click_detection = False
+    cancel_ai_search()
+    match = Match(Game(custom_board))
     text_box = "chess"
     draw_board()
+    warm_up_engine()
 
     # Create buttons
     one_player_button = Button(window, text="One Player", font=("Arial", max(12, int(cell_size * 0.3))), command=one_player)
@@ -1001,51 +647,62 @@ def start_screen():
         btn.place(relx=0.5, y=start_y + i*spacing, anchor="center", width=int(cell_size*3), height=int(cell_size*0.8))
 
 def one_player():
-    global game_mode
-    game_mode = 0
     clear_buttons()
-    initiate_chess()
+    initiate_chess(0)
 
 def two_player():
-    global game_mode
-    game_mode = 1
     clear_buttons()
-    initiate_chess()
+    initiate_chess(1)
 
 # ---------- Chess initiation ----------
-def initiate_chess():
-    global board, turn, selected, king_moved, rook_moved, ai, click_detection, text_box, move_history, redo_stack
+# One Stockfish process serves every game of the session; it is quit in on_close. It is launched
+# in the background from start_screen so the first one-player game does not wait for the handshake.
+# Without a working Stockfish the built-in engine (engine.py) plays instead.
+def warm_up_engine():
+    global engine_startup
+    if ai is None and engine_startup is None:
+        engine_startup = start_in_background(ai_difficulty, STOCKFISH_PATH)
+
+def engine_ready():
+    # adopts the engine once its background start finishes; None while starting or if it failed
+    global ai, engine_startup
+    if ai is None and engine_startup is not None and engine_startup.done():
+        startup, engine_startup = engine_startup, None
+        try:
+            ai = startup.result()
+            ai.set_difficulty(ai_difficulty)  # the level may have changed while it started
+            print("[INFO] Stockfish started successfully.")
+        except Exception as e:
+            print(f"[ERROR] Failed to start Stockfish: {e}")
+            use_builtin_engine()
+    return ai
+
+def use_builtin_engine():
+    global ai
+    if ai:
+        ai.quit()
+    ai = BuiltinAI(ai_difficulty)
+    print("[INFO] Using the built-in engine.")
 
-    move_history = []
-    redo_stack = []
-    click_detection = True
+def initiate_chess(mode):
+    global match, text_box
+
+    cancel_ai_search()
     text_box = None
-    turn = 0
-    selected = None
-    king_moved = {0: False, 1: False}
-    rook_moved = {0: {0: False, 7: False}, 1: {0: False, 7: False}}
 
-    # ✅ 1. Create a new board first
-    board = create_board()
+    # ✅ 1. Create a new game first
+    match = Match(Game(custom_board), mode)
+    match.click_detection = True
 
     # ✅ 2. Start drawing before starting Stockfish
-    canvas.delete("all")
     draw_board()
     in_game_options()  # move here so buttons appear immediately
 
-    # ✅ 3. Initialize Stockfish safely
-    try:
-        ai = StockfishAI(difficulty=ai_difficulty, path=STOCKFISH_PATH)
-        print("[INFO] Stockfish started successfully.")
-    except Exception as e:
-        ai = None
-        print(f"[ERROR] Failed to start Stockfish: {e}")
-
-==    if ai is not None:
-        try:
-            sync_stockfish()
-        except Exception as e:
-            print(f"[WARN] Could not sync Stockfish: {e}")
+    # ✅ 3. Reuse the session's engine; one still starting up is fresh anyway
+    if match.mode == 0:
+        warm_up_engine()
+        if engine_ready():
+            ai.new_game()
 
     canvas.bind("<Button-1>", on_click)
 
@@ -1060,6 +717,10 @@ def debug_board(debug_board_name):
 # ---------- Shutdown handling ----------
 def on_close():
     global ai
+    cancel_ai_search()
+    if engine_startup is not None:
+        wait([engine_startup], timeout=HANDSHAKE_TIMEOUT)  # so a half-started engine is not orphaned
+        engine_ready()
     if ai:
         try:
             ai.quit()
@@ -1075,5 +736,5 @@ window.protocol("WM_DELETE_WINDOW", on_close)
 #board = debug_board('checkmate')
 
 start_screen()
-animate()
+request_frame()
 window.mainloop()
\ No newline at end of file
@@ -0,0 +1,355 @@
+import threading
+import time
+from concurrent.futures import Future
+
+from rules import (CODE_VALUES, PIECE_VALUES, bit_squares, in_check, insufficient_material, is_fifty_move_draw,
+                   is_repetition, legal_moves, make_move, move_to_uci, unmake_move)
+
+# Built-in engine for one-player games when no Stockfish binary is available. Plain alpha-beta on
+# top of the rules core: iterative deepening under a time budget, a transposition table keyed by
+# the Zobrist key, MVV-LVA / killer / history move ordering and a captures-only quiescence search.
+
+MATE = 100000
+MATE_BOUND = MATE - 1000  # scores past this are mates; the table stores them relative to the node
+MAX_PLY = 64
+TABLE_SIZE = 200000       # transposition entries kept before the table is cleared
+CHECK_EVERY = 1024        # nodes between clock checks (power of two)
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+# ---------- Evaluation ----------
+# Piece-square tables from white's side, index sq = r*8 + c (a8 first); black reads them mirrored.
+PAWN_TABLE = [
+     0,   0,   0,   0,   0,   0,   0,   0,
+    50,  50,  50,  50,  50,  50,  50,  50,
+    10,  10,  20,  30,  30,  20,  10,  10,
+     5,   5,  10,  25,  25,  10,   5,   5,
+     0,   0,   0,  20,  20,   0,   0,   0,
+     5,  -5, -10,   0,   0, -10,  -5,   5,
+     5,  10,  10, -20, -20,  10,  10,   5,
+     0,   0,   0,   0,   0,   0,   0,   0]
+KNIGHT_TABLE = [
+   -50, -40, -30, -30, -30, -30, -40, -50,
+   -40, -20,   0,   0,   0,   0, -20, -40,
+   -30,   0,  10,  15,  15,  10,   0, -30,
+   -30,   5,  15,  20,  20,  15,   5, -30,
+   -30,   0,  15,  20,  20,  15,   0, -30,
+   -30,   5,  10,  15,  15,  10,   5, -30,
+   -40, -20,   0,   5,   5,   0, -20, -40,
+   -50, -40, -30, -30, -30, -30, -40, -50]
+BISHOP_TABLE = [
+   -20, -10, -10, -10, -10, -10, -10, -20,
+   -10,   0,   0,   0,   0,   0,   0, -10,
+   -10,   0,   5,  10,  10,   5,   0, -10,
+   -10,   5,   5,  10,  10,   5,   5, -10,
+   -10,   0,  10,  10,  10,  10,   0, -10,
+   -10,  10,  10,  10,  10,  10,  10, -10,
+   -10,   5,   0,   0,   0,   0,   5, -10,
+   -20, -10, -10, -10, -10, -10, -10, -20]
+ROOK_TABLE = [
+     0,   0,   0,   0,   0,   0,   0,   0,
+     5,  10,  10,  10,  10,  10,  10,   5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+     0,   0,   0,   5,   5,   0,   0,   0]
+QUEEN_TABLE = [
+   -20, -10, -10,  -5,  -5, -10, -10, -20,
+   -10,   0,   0,   0,   0,   0,   0, -10,
+   -10,   0,   5,   5,   5,   5,   0, -10,
+    -5,   0,   5,   5,   5,   5,   0,  -5,
+     0,   0,   5,   5,   5,   5,   0,  -5,
+   -10,   5,   5,   5,   5,   5,   0, -10,
+   -10,   0,   5,   0,   0,   0,   0, -10,
+   -20, -10, -10,  -5,  -5, -10, -10, -20]
+KING_TABLE = [
+   -30, -40, -40, -50, -50, -40, -40, -30,
+   -30, -40, -40, -50, -50, -40, -40, -30,
+   -30, -40, -40, -50, -50, -40, -40, -30,
+   -30, -40, -40, -50, -50, -40, -40, -30,
+   -20, -30, -30, -40, -40, -30, -30, -20,
+   -10, -20, -20, -20, -20, -20, -20, -10,
+    20,  20,   0,   0,   0,   0,  20,  20,
+    20,  30,  10,   0,   0,  10,  30,  20]
+KING_ENDGAME_TABLE = [
+   -50, -40, -30, -20, -20, -30, -40, -50,
+   -30, -20, -10,   0,   0, -10, -20, -30,
+   -30, -10,  20,  30,  30,  20, -10, -30,
+   -30, -10,  30,  40,  40,  30, -10, -30,
+   -30, -10,  30,  40,  40,  30, -10, -30,
+   -30, -10,  20,  30,  30,  20, -10, -30,
+   -30, -30,   0,   0,   0,   0, -30, -30,
+   -50, -30, -30, -30, -30, -30, -30, -50]
+ENDGAME_MATERIAL = 2600   # non-pawn material on the board (both sides) at which the king comes out
+
+def _square_tables(king_table):
+    # bitboard index (player*6 + type) -> 64 placement bonuses for that piece
+    tables = [PAWN_TABLE, king_table, QUEEN_TABLE, BISHOP_TABLE, ROOK_TABLE, KNIGHT_TABLE]
+    return [table[:] for table in tables] + [[table[sq ^ 56] for sq in range(64)] for table in tables]
+
+SQUARE_TABLES = _square_tables(KING_TABLE)
+ENDGAME_SQUARE_TABLES = _square_tables(KING_ENDGAME_TABLE)
+
+def evaluate(position):
+    # material plus piece placement in centipawns, from the side to move's point of view
+    material, counts = position.material, position.piece_counts
+    pieces = material[0] + material[1] - PIECE_VALUES[0] * (counts[0] + counts[6])
+    tables = ENDGAME_SQUARE_TABLES if pieces <= ENDGAME_MATERIAL else SQUARE_TABLES
+    score = material[0] - material[1]
+    bitboards = position.bitboards
+    for index in range(6):
+        table = tables[index]
+        for sq in bit_squares(bitboards[index]):
+            score += table[sq]
+        table = tables[index + 6]
+        for sq in bit_squares(bitboards[index + 6]):
+            score -= table[sq]
+    return score if position.turn == 0 else -score
+
+
+# ---------- Search ----------
+class SearchAborted(Exception):
+    pass
+
+def to_table(score, ply):
+    # mate scores are stored as distance from this node, not from the root
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+def from_table(score, ply):
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+class Search:
+    def __init__(self, position, table, movetime, max_depth, stop):
+        self.position = position  # private copy, left mid-move if the search is aborted
+        self.table = table        # key -> (depth, score, flag, best move); may be shared between searches
+        self.start = time.perf_counter()
+        self.movetime = movetime
+        self.max_depth = max_depth
+        self.stop = stop
+        self.nodes = 0
+        self.can_abort = False    # depth 1 always finishes so there is a move to play
+        self.killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        self.history = [0] * 4096  # from_sq*64 + to_sq -> bonus for quiet moves that caused a cutoff
+
+    def check_time(self):
+        if self.can_abort and (self.stop.is_set() or time.perf_counter() - self.start > self.movetime):
+            raise SearchAborted
+
+    def run(self):
+        # iterative deepening; returns (move, score, depth) of the deepest finished iteration
+        moves = legal_moves(self.position)
+        if not moves:
+            return None, 0, 0
+        best_move, best_score, depth_done = moves[0], 0, 0
+        for depth in range(1, self.max_depth + 1):
+            try:
+                best_score, best_move = self.search_root(moves, depth, best_move)
+            except SearchAborted:
+                break
+            depth_done = depth
+            self.can_abort = True
+            if abs(best_score) > MATE_BOUND:
+                break  # forced mate found
+            if time.perf_counter() - self.start > self.movetime / 2:
+                break  # the next iteration would not finish in time
+        return best_move, best_score, depth_done
+
+    def search_root(self, moves, depth, previous_best):
+        position = self.position
+        alpha, beta = -MATE - 1, MATE + 1
+        best_move = None
+        for move in self.order(moves, previous_best, 0):
+            make_move(position, move)
+            score = -self.negamax(depth - 1, -beta, -alpha, 1)
+            unmake_move(position)
+            if best_move is None or score > alpha:
+                alpha, best_move = score, move
+        self.store(position.key, depth, alpha, EXACT, best_move, 0)
+        return alpha, best_move
+
+    def negamax(self, depth, alpha, beta, ply):
+        self.nodes += 1
+        if not self.nodes & (CHECK_EVERY - 1):
+            self.check_time()
+        position = self.position
+        if is_repetition(position, 2) or is_fifty_move_draw(position) or insufficient_material(position):
+            return 0
+        checked = in_check(position)
+        if checked:
+            depth += 1  # check extension
+        if depth <= 0 or ply >= MAX_PLY:
+            return self.quiescence(alpha, beta, ply)
+
+        key = position.key
+        entry = self.table.get(key)
+        table_move = None
+        if entry:
+            entry_depth, entry_score, flag, table_move = entry
+            if entry_depth >= depth:
+                score = from_table(entry_score, ply)
+                if flag == EXACT or (flag == LOWER and score >= beta) or (flag == UPPER and score <= alpha):
+                    return score
+
+        moves = legal_moves(position)
+        if not moves:
+            return -MATE + ply if checked else 0
+        original_alpha = alpha
+        best_score, best_move = -MATE - 1, None
+        for move in self.order(moves, table_move, ply):
+            captured = make_move(position, move)
+            score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            unmake_move(position)
+            if score > best_score:
+                best_score, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if not captured and move[2] is None:
+                            killers = self.killers[ply]
+                            if killers[0] != move:
+                                killers[1], killers[0] = killers[0], move
+                            self.history[move[0]*64 + move[1]] += depth * depth
+                        break
+        flag = UPPER if best_score <= original_alpha else LOWER if best_score >= beta else EXACT
+        self.store(key, depth, best_score, flag, best_move, ply)
+        return best_score
+
+    def quiescence(self, alpha, beta, ply):
+        # only captures and queen promotions, so the static evaluation is never taken mid-exchange
+        self.nodes += 1
+        if not self.nodes & (CHECK_EVERY - 1):
+            self.check_time()
+        position = self.position
+        stand_pat = evaluate(position)
+        if stand_pat >= beta or ply >= MAX_PLY:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+        board = position.board
+        captures = [move for move in legal_moves(position) if board[move[1]] or move[2] == 2]
+        captures.sort(key=lambda move: self.capture_order(board, move), reverse=True)
+        for move in captures:
+            make_move(position, move)
+            score = -self.quiescence(-beta, -alpha, ply + 1)
+            unmake_move(position)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def capture_order(self, board, move):
+        # MVV-LVA: most valuable victim first, cheapest attacker breaking ties
+        gain = CODE_VALUES[board[move[1]]] * 10 - CODE_VALUES[board[move[0]]]
+        if move[2] is not None:
+            gain += PIECE_VALUES[move[2]] * 10
+        return gain
+
+    def order(self, moves, table_move, ply):
+        board = self.position.board
+        killers = self.killers[ply]
+        history = self.history
+
+        def rank(move):
+            if move == table_move:
+                return 1 << 40
+            if board[move[1]] or move[2] is not None:
+                return (1 << 30) + self.capture_order(board, move)
+            if move == killers[0]:
+                return (1 << 29) + 1
+            if move == killers[1]:
+                return 1 << 29
+            return history[move[0]*64 + move[1]]
+        return sorted(moves, key=rank, reverse=True)
+
+    def store(self, key, depth, score, flag, move, ply):
+        table = self.table
+        if len(table) >= TABLE_SIZE:
+            table.clear()
+        table[key] = (depth, to_table(score, ply), flag, move)
+
+def find_best_move(position, movetime=1.0, max_depth=MAX_PLY, stop=None, table=None):
+    # searches a copy of position for up to movetime seconds;
+    # returns (move, score in centipawns for the side to move, depth reached)
+    search = Search(position.copy(), {} if table is None else table, movetime, max_depth,
+                    stop or threading.Event())
+    return search.run()
+
+
+# ---------- Engine front ----------
+# Same calls chess.py makes on StockfishAI, so one-player mode does not care which engine it has.
+class BuiltinAI:
+    def __init__(self, difficulty="Medium"):
+        self.difficulty = difficulty
+        self.depth = 4
+        self.movetime = 1000  # milliseconds per move
+        self.table = {}       # kept between moves, cleared for a new game
+        self.stop_event = threading.Event()
+        self.set_difficulty(difficulty)
+
+    def engine_alive(self):
+        return True
+
+    def can_restart(self):
+        return False
+
+    def set_difficulty(self, level):
+        # each level is a response-time budget with a depth cap, as for Stockfish
+        self.difficulty = level
+        if level == "Easy":
+            self.depth, self.movetime = 2, 300
+        elif level == "Medium":
+            self.depth, self.movetime = 4, 1000
+        elif level == "Hard":
+            self.depth, self.movetime = MAX_PLY, 2500
+
+    def time_budget(self, clock, turn):
+        # seconds for this move; with real clocks a share of the remaining time plus most of the increment
+        if not clock:
+            return self.movetime / 1000
+        remaining, increment = clock[turn], clock[2 + turn]
+        return min(remaining / 30 + increment * 0.8, remaining / 2) / 1000
+
+    def start_search(self, game, clock=None):
+        # the search runs on a worker thread over a copy of the position; the Future gets a UCI move
+        self.stop()
+        stop = self.stop_event = threading.Event()
+        search = Future()
+        position = game.position
+        args = (position.copy(), self.time_budget(clock, position.turn), self.depth, stop, self.table)
+
+        def run():
+            try:
+                move = find_best_move(*args)[0]
+                search.set_result(move_to_uci(move) if move else None)
+            except Exception as e:
+                search.set_exception(e)
+        threading.Thread(target=run, daemon=True).start()
+        return search
+
+    def start_ponder(self, game, clock=None):
+        pass  # no pondering; the search is cheap to restart
+
+    def stop(self):
+        self.stop_event.set()
+
+    def new_game(self):
+        self.stop()
+        self.table.clear()
+
+    def get_ai_move(self, game):
+        # blocking form for callers without an event loop
+        return self.start_search(game).result()
+
+    def quit(self):
+        self.stop()
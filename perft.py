@@ -0,0 +1,135 @@
+import argparse
+import sys
+import time
+
+from rules import START_FEN, legal_moves, make_move, unmake_move, move_to_uci, position_from_fen
+
+# Perft counts every leaf of the legal move tree to a fixed depth. Matching the
+# published counts below is the standard check that move generation, castling,
+# en passant and promotion are all correct; the nodes/second figure tracks speed.
+
+# (name, fen, {depth: expected nodes})
+REFERENCE_POSITIONS = [
+    ("start position", START_FEN,
+     {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     {1: 48, 2: 2039, 3: 97862, 4: 4085603}),
+    ("endgame en passant", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ("promotion and castling", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     {1: 6, 2: 264, 3: 9467, 4: 422333}),
+    ("promotion tactics", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     {1: 44, 2: 1486, 3: 62379, 4: 2103487}),
+    ("middlegame", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     {1: 46, 2: 2079, 3: 89890, 4: 3894594}),
+    # edge cases: illegal en passant, castling through/into check, promotions around the king
+    ("en passant pin (rank)", "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1",
+     {1: 18, 2: 92, 3: 1670, 4: 10138, 5: 185429, 6: 1134888}),
+    ("en passant pin (diagonal)", "8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1",
+     {1: 13, 2: 102, 3: 1266, 4: 10276, 5: 135655, 6: 1015133}),
+    ("en passant gives check", "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",
+     {1: 15, 2: 126, 3: 1928, 4: 13931, 5: 206379, 6: 1440467}),
+    ("short castle gives check", "5k2/8/8/8/8/8/8/4K2R w K - 0 1",
+     {1: 15, 2: 66, 3: 1198, 4: 6399, 5: 120330, 6: 661072}),
+    ("long castle gives check", "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1",
+     {1: 16, 2: 71, 3: 1286, 4: 7418, 5: 141077, 6: 803711}),
+    ("castling rights lost", "r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1",
+     {1: 26, 2: 1141, 3: 27826, 4: 1274206}),
+    ("castling prevented", "r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1",
+     {1: 44, 2: 1494, 3: 50509, 4: 1720476}),
+    ("promote out of check", "2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1",
+     {1: 11, 2: 133, 3: 1442, 4: 19174, 5: 266199, 6: 3821001}),
+    ("discovered check", "8/8/1P2K3/8/2n5/1q6/8/5k2 b - - 0 1",
+     {1: 29, 2: 165, 3: 5160, 4: 31961, 5: 1004658}),
+    ("promote to give check", "4k3/1P6/8/8/8/8/K7/8 w - - 0 1",
+     {1: 9, 2: 40, 3: 472, 4: 2661, 5: 38983, 6: 217342}),
+    ("underpromote to give check", "8/P1k5/K7/8/8/8/8/8 w - - 0 1",
+     {1: 6, 2: 27, 3: 273, 4: 1329, 5: 18135, 6: 92683}),
+    ("self stalemate", "K1k5/8/P7/8/8/8/8/8 w - - 0 1",
+     {1: 2, 2: 6, 3: 13, 4: 63, 5: 382, 6: 2217}),
+    ("stalemate and checkmate (pawn)", "8/k1P5/8/1K6/8/8/8/8 w - - 0 1",
+     {1: 10, 2: 25, 3: 268, 4: 926, 5: 10857, 6: 43261, 7: 567584}),
+    ("stalemate and checkmate (pieces)", "8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1",
+     {1: 37, 2: 183, 3: 6559, 4: 23527}),
+]
+
+
+def perft(position, depth):
+    if depth == 0:
+        return 1
+    moves = legal_moves(position)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        make_move(position, move)
+        nodes += perft(position, depth - 1)
+        unmake_move(position)
+    return nodes
+
+def divide(position, depth):
+    # node count below each root move, the usual way to bisect a perft mismatch
+    counts = []
+    for move in legal_moves(position):
+        make_move(position, move)
+        counts.append((move_to_uci(move), perft(position, depth - 1)))
+        unmake_move(position)
+    return counts
+
+def timed_perft(position, depth):
+    start = time.perf_counter()
+    nodes = perft(position, depth)
+    elapsed = time.perf_counter() - start
+    return nodes, elapsed
+
+def format_rate(nodes, elapsed):
+    nps = int(nodes / elapsed) if elapsed > 0 else 0
+    return f"{nodes} nodes in {elapsed:.3f}s ({nps} nps)"
+
+def run_suite(max_depth):
+    failures = 0
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, expected in REFERENCE_POSITIONS:
+        depths = [d for d in expected if d <= max_depth]
+        if not depths:
+            continue
+        depth = max(depths)
+        nodes, elapsed = timed_perft(position_from_fen(fen), depth)
+        total_nodes += nodes
+        total_time += elapsed
+        ok = nodes == expected[depth]
+        if not ok:
+            failures += 1
+        status = "ok" if ok else f"FAIL (expected {expected[depth]})"
+        print(f"{name:<34} depth {depth}: {format_rate(nodes, elapsed)} {status}")
+    print(f"total: {format_rate(total_nodes, total_time)}, {failures} failed")
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft node counts for the rules core.")
+    parser.add_argument("--fen", default=START_FEN, help="position to search (default: start position)")
+    parser.add_argument("--depth", type=int, default=3, help="search depth (suite: deepest reference depth to run)")
+    parser.add_argument("--divide", action="store_true", help="print the node count under each root move")
+    parser.add_argument("--suite", action="store_true", help="run the reference positions and compare node counts")
+    args = parser.parse_args(argv)
+
+    if args.suite:
+        return 1 if run_suite(args.depth) else 0
+
+    position = position_from_fen(args.fen)
+    if args.divide:
+        start = time.perf_counter()
+        counts = divide(position, args.depth)
+        elapsed = time.perf_counter() - start
+        for move, nodes in counts:
+            print(f"{move}: {nodes}")
+        print(f"moves: {len(counts)}")
+        print(format_rate(sum(nodes for _, nodes in counts), elapsed))
+    else:
+        nodes, elapsed = timed_perft(position, args.depth)
+        print(f"depth {args.depth}: {format_rate(nodes, elapsed)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
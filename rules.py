@@ -0,0 +1,794 @@
+import random
+from collections import OrderedDict
+
+# Rules core: board, move generation and game state with no Tkinter dependency,
+# so it can be imported by headless workers as well as by the chess.py front end.
+
+# --- Globals ---
+piece_types = {0: 'P', 1: 'K', 2: 'Q', 3: 'B', 4: 'R', 5: 'N'}
+player_colors = {0: 'white', 1: 'black'}
+
+
+# ---------- Board creation ----------
+# A board is a bytearray(64) mailbox indexed by sq = r*8 + c. Each byte is 0 for an empty square
+# or the piece code 1 + player*6 + piece_type, so code - 1 is the piece's bitboard index.
+EMPTY = 0
+PIECES = [False] + [(player, ptype) for player in (0, 1) for ptype in range(6)]  # code -> (player, type)
+
+def piece_code(piece):
+    # (player, type) -> board byte
+    return 1 + piece[0]*6 + piece[1]
+
+def create_board(custom_board=None):
+    board = bytearray(64)
+    if custom_board:
+        for xy, piece in custom_board:
+            r, c = xy
+            board[r*8 + c] = piece_code(piece)
+        return board
+
+    # pawns
+    for player_id in player_colors:
+        row = 6 if player_id == 0 else 1
+        for i in range(8):
+            board[row*8 + i] = piece_code((player_id, 0))  # pawn
+
+    # back rows
+    rows = {player_colors[0]: 7, player_colors[1]: 0}
+    for player_id, color_name in player_colors.items():
+        base = rows[color_name] * 8
+        board[base + 4] = piece_code((player_id, 1))  # king
+        board[base + 3] = piece_code((player_id, 2))  # queen
+        for col in [2, 5]:
+            board[base + col] = piece_code((player_id, 3))  # bishops
+        for col in [0, 7]:
+            board[base + col] = piece_code((player_id, 4))  # rooks
+        for col in [1, 6]:
+            board[base + col] = piece_code((player_id, 5))  # knights
+    return board
+
+
+# ---------- Bitboards ----------
+# Square index sq = r*8 + c, so bit 0 is a8 and bit 63 is h1 (same orientation as the board bytes).
+# Piece bitboards live in a flat list indexed player*6 + piece_type.
+def bit_squares(mask):
+    squares = []
+    while mask:
+        low = mask & -mask
+        squares.append(low.bit_length() - 1)
+        mask ^= low
+    return squares
+
+def _step_table(offsets):
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        mask = 0
+        for dr, dc in offsets:
+            nr, nc = r + dr, c + dc
+            if 0 <= nr <= 7 and 0 <= nc <= 7:
+                mask |= 1 << (nr*8 + nc)
+        table.append(mask)
+    return table
+
+KNIGHT_ATTACKS = _step_table([(-2,-1),(-2,1),(-1,-2),(-1,2),(1,-2),(1,2),(2,-1),(2,1)])
+KING_ATTACKS = _step_table([(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)])
+PAWN_ATTACKS = [_step_table([(-1, -1), (-1, 1)]), _step_table([(1, -1), (1, 1)])]  # squares a pawn of each player attacks
+
+# sliding rays, one table per direction; a direction is "positive" when it walks towards higher squares
+ROOK_DIRECTIONS = [(-1,0),(1,0),(0,-1),(0,1)]
+BISHOP_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+def _ray_table(dr, dc):
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        mask = 0
+        r, c = r + dr, c + dc
+        while 0 <= r <= 7 and 0 <= c <= 7:
+            mask |= 1 << (r*8 + c)
+            r += dr; c += dc
+        table.append(mask)
+    return table
+
+RAYS = {d: _ray_table(*d) for d in ROOK_DIRECTIONS + BISHOP_DIRECTIONS}
+_ROOK_RAYS = [(RAYS[d], d[0]*8 + d[1] > 0) for d in ROOK_DIRECTIONS]
+_BISHOP_RAYS = [(RAYS[d], d[0]*8 + d[1] > 0) for d in BISHOP_DIRECTIONS]
+
+def _slider_attacks(sq, occupied, rays):
+    attacks = 0
+    for table, positive in rays:
+        ray = table[sq]
+        blockers = ray & occupied
+        if blockers:
+            if positive:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            ray ^= table[first]
+        attacks |= ray
+    return attacks
+
+def rook_attacks(sq, occupied):
+    return _slider_attacks(sq, occupied, _ROOK_RAYS)
+
+def bishop_attacks(sq, occupied):
+    return _slider_attacks(sq, occupied, _BISHOP_RAYS)
+
+# BETWEEN[a][b]: squares strictly between two aligned squares; LINE[a][b]: the whole line through both
+def _line_tables():
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+    for dr, dc in ROOK_DIRECTIONS + BISHOP_DIRECTIONS:
+        forward, backward = RAYS[(dr, dc)], RAYS[(-dr, -dc)]
+        for a in range(64):
+            squares = bit_squares(forward[a])
+            if dr*8 + dc < 0:
+                squares.reverse()  # walk outward from a
+            gap = 0
+            for b in squares:
+                between[a][b] = gap
+                line[a][b] = forward[a] | backward[a] | (1 << a)
+                gap |= 1 << b
+    return between, line
+
+BETWEEN, LINE = _line_tables()
+
+def attackers_to(position, sq, by_player, occupied=None):
+    # every by_player piece attacking sq, found by looking outward from sq
+    bitboards = position.bitboards
+    if occupied is None:
+        occupied = position.occupancy[0] | position.occupancy[1]
+    base = by_player*6
+    queens = bitboards[base + 2]
+    return ((PAWN_ATTACKS[1 - by_player][sq] & bitboards[base])
+            | (KNIGHT_ATTACKS[sq] & bitboards[base + 5])
+            | (KING_ATTACKS[sq] & bitboards[base + 1])
+            | (rook_attacks(sq, occupied) & (bitboards[base + 4] | queens))
+            | (bishop_attacks(sq, occupied) & (bitboards[base + 3] | queens)))
+
+def is_square_attacked(position, sq, by_player):
+    # look outward from sq: a piece attacks sq exactly when the same piece on sq would attack it back
+    bitboards = position.bitboards
+    base = by_player*6
+    if PAWN_ATTACKS[1 - by_player][sq] & bitboards[base]: return True
+    if KNIGHT_ATTACKS[sq] & bitboards[base + 5]: return True
+    if KING_ATTACKS[sq] & bitboards[base + 1]: return True
+    occupied = position.occupancy[0] | position.occupancy[1]
+    queens = bitboards[base + 2]
+    if rook_attacks(sq, occupied) & (bitboards[base + 4] | queens): return True
+    return bool(bishop_attacks(sq, occupied) & (bitboards[base + 3] | queens))
+
+
+# ---------- Position ----------
+# castling rights bits: 1 = white kingside, 2 = white queenside, 4 = black kingside, 8 = black queenside
+ALL_CASTLING = 15
+CASTLING_MASK = [ALL_CASTLING] * 64  # rights kept when a piece leaves or lands on each square
+CASTLING_MASK[60] &= ~3   # e1
+CASTLING_MASK[63] &= ~1   # h1
+CASTLING_MASK[56] &= ~2   # a1
+CASTLING_MASK[4] &= ~12   # e8
+CASTLING_MASK[7] &= ~4    # h8
+CASTLING_MASK[0] &= ~8    # a8
+
+# material in centipawns by piece type (0 = pawn, 1 = king, 2 = queen, 3 = bishop, 4 = rook, 5 = knight)
+PIECE_VALUES = [100, 0, 900, 330, 500, 320]
+CODE_VALUES = [0] + PIECE_VALUES * 2  # same, indexed by board byte
+
+def castling_from_board(board):
+    # rights still possible given where the kings and rooks stand (custom start boards)
+    rights = 0
+    if board[60] == piece_code((0, 1)):
+        rights |= (board[63] == piece_code((0, 4))) * 1 | (board[56] == piece_code((0, 4))) * 2
+    if board[4] == piece_code((1, 1)):
+        rights |= (board[7] == piece_code((1, 4))) * 4 | (board[0] == piece_code((1, 4))) * 8
+    return rights
+
+# Zobrist keys: one random 64-bit number per (piece, square), castling state, en-passant file and side to move.
+# Fixed seed so keys are stable between runs and processes.
+_zobrist_random = random.Random(0x5EED)
+ZOBRIST_PIECES = [[_zobrist_random.getrandbits(64) for _ in range(64)] for _ in range(12)]
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(16)]
+ZOBRIST_EP_FILE = [_zobrist_random.getrandbits(64) for _ in range(8)]
+ZOBRIST_BLACK = _zobrist_random.getrandbits(64)
+
+def ep_key(position):
+    # the en-passant file only counts when a pawn of the side to move can actually take
+    ep_square = position.ep_square
+    if ep_square is None:
+        return 0
+    us = position.turn
+    if PAWN_ATTACKS[1 - us][ep_square] & position.bitboards[us*6]:
+        return ZOBRIST_EP_FILE[ep_square & 7]
+    return 0
+
+def compute_key(position):
+    key = ZOBRIST_CASTLING[position.castling] ^ ep_key(position)
+    if position.turn == 1:
+        key ^= ZOBRIST_BLACK
+    for index, mask in enumerate(position.bitboards):
+        for sq in bit_squares(mask):
+            key ^= ZOBRIST_PIECES[index][sq]
+    return key
+
+class Position:
+    __slots__ = ('board', 'turn', 'castling', 'ep_square', 'halfmove', 'fullmove', 'history', 'bitboards',
+                 'occupancy', 'king_squares', 'piece_counts', 'material', 'key')
+
+    def __init__(self, board=None, turn=0, castling=ALL_CASTLING, ep_square=None, halfmove=0, fullmove=1):
+        self.board = board if board is not None else create_board()
+        self.turn = turn
+        self.castling = castling
+        self.ep_square = ep_square  # square skipped by a double pawn push, if any
+        self.halfmove = halfmove    # plies since the last capture or pawn move
+        self.fullmove = fullmove
+        self.history = []  # undo records pushed by make_move; their keys double as the repetition history
+        self.bitboards = [0] * 12
+        self.occupancy = [0, 0]
+        # bitboards double as per-side piece lists; counts, material and king squares are kept
+        # alongside them on every change so none of them needs a board scan
+        self.king_squares = [None, None]
+        self.piece_counts = [0] * 12  # indexed like bitboards
+        self.material = [0, 0]
+        for sq, code in enumerate(self.board):
+            if code:
+                player, ptype = PIECES[code]
+                self.bitboards[code - 1] |= 1 << sq
+                self.occupancy[player] |= 1 << sq
+                self.piece_counts[code - 1] += 1
+                self.material[player] += CODE_VALUES[code]
+                if ptype == 1:
+                    self.king_squares[player] = sq
+        self.key = compute_key(self)  # Zobrist key, kept up to date by every change below
+
+    def copy(self):
+        new = Position.__new__(Position)
+        new.board = self.board[:]
+        new.turn = self.turn
+        new.castling = self.castling
+        new.ep_square = self.ep_square
+        new.halfmove = self.halfmove
+        new.fullmove = self.fullmove
+        new.history = self.history[:]
+        new.bitboards = self.bitboards[:]
+        new.occupancy = self.occupancy[:]
+        new.king_squares = self.king_squares[:]
+        new.piece_counts = self.piece_counts[:]
+        new.material = self.material[:]
+        new.key = self.key
+        return new
+
+    def occupied(self):
+        return self.occupancy[0] | self.occupancy[1]
+
+    def piece_at(self, sq):
+        # (player, type) or False
+        return PIECES[self.board[sq]]
+
+    def put_piece(self, sq, code):
+        self.remove_piece(sq)
+        player, ptype = PIECES[code]
+        bit = 1 << sq
+        self.bitboards[code - 1] |= bit
+        self.occupancy[player] |= bit
+        self.piece_counts[code - 1] += 1
+        self.material[player] += CODE_VALUES[code]
+        self.board[sq] = code
+        self.key ^= ZOBRIST_PIECES[code - 1][sq]
+        if ptype == 1:
+            self.king_squares[player] = sq
+
+    def remove_piece(self, sq):
+        # returns the code of the piece taken off (EMPTY if there was none)
+        code = self.board[sq]
+        if code:
+            player, ptype = PIECES[code]
+            bit = 1 << sq
+            self.bitboards[code - 1] ^= bit
+            self.occupancy[player] ^= bit
+            self.piece_counts[code - 1] -= 1
+            self.material[player] -= CODE_VALUES[code]
+            self.board[sq] = EMPTY
+            self.key ^= ZOBRIST_PIECES[code - 1][sq]
+            if ptype == 1:
+                self.king_squares[player] = None
+        return code
+
+    def pack(self):
+        # 67 bytes: the 64 board bytes, side to move | castling << 1, en passant square (64 = none),
+        # halfmove clock (capped at 255)
+        ep_square = 64 if self.ep_square is None else self.ep_square
+        return bytes(self.board) + bytes((self.turn | self.castling << 1, ep_square, min(self.halfmove, 255)))
+
+def unpack_position(data):
+    # inverse of Position.pack; the result has no move history
+    flags, ep_square, halfmove = data[64], data[65], data[66]
+    return Position(bytearray(data[:64]), flags & 1, flags >> 1, None if ep_square == 64 else ep_square, halfmove)
+
+
+# ---------- Make / unmake ----------
+# A move is (from_sq, to_sq, promotion) with promotion None or the piece type to promote to.
+def make_move(position, move):
+    from_sq, to_sq, promotion = move
+    board, bitboards, occupancy = position.board, position.bitboards, position.occupancy
+    code = board[from_sq]
+    player, ptype = PIECES[code]
+    captured_sq = to_sq
+    if ptype == 0 and to_sq == position.ep_square:
+        captured_sq = to_sq + 8 if player == 0 else to_sq - 8
+    captured = board[captured_sq]
+    key = position.key
+    position.history.append((move, captured, captured_sq, position.castling, position.ep_square, key,
+                             position.halfmove))
+    position.halfmove = 0 if ptype == 0 or captured else position.halfmove + 1
+    if player == 1:
+        position.fullmove += 1
+    key ^= ep_key(position) ^ ZOBRIST_CASTLING[position.castling]
+
+    if captured:
+        bit = 1 << captured_sq
+        bitboards[captured - 1] ^= bit
+        occupancy[1 - player] ^= bit
+        position.piece_counts[captured - 1] -= 1
+        position.material[1 - player] -= CODE_VALUES[captured]
+        board[captured_sq] = EMPTY
+        key ^= ZOBRIST_PIECES[captured - 1][captured_sq]
+    from_bit, to_bit = 1 << from_sq, 1 << to_sq
+    board[from_sq] = EMPTY
+    bitboards[code - 1] ^= from_bit
+    key ^= ZOBRIST_PIECES[code - 1][from_sq]
+    if promotion is not None:
+        position.piece_counts[code - 1] -= 1
+        code = 1 + player*6 + promotion
+        position.piece_counts[code - 1] += 1
+        position.material[player] += CODE_VALUES[code] - PIECE_VALUES[0]
+    bitboards[code - 1] |= to_bit
+    occupancy[player] ^= from_bit | to_bit
+    board[to_sq] = code
+    position.key = key ^ ZOBRIST_PIECES[code - 1][to_sq]
+
+    if ptype == 1:
+        position.king_squares[player] = to_sq
+    if ptype == 1 and abs(to_sq - from_sq) == 2:
+        # castling: bring the rook across the king
+        if to_sq > from_sq:
+            position.put_piece(to_sq - 1, position.remove_piece(to_sq + 1))
+        else:
+            position.put_piece(to_sq + 1, position.remove_piece(to_sq - 2))
+
+    position.castling &= CASTLING_MASK[from_sq] & CASTLING_MASK[to_sq]
+    position.ep_square = (from_sq + to_sq) >> 1 if ptype == 0 and abs(to_sq - from_sq) == 16 else None
+    position.turn = 1 - player
+    position.key ^= ZOBRIST_CASTLING[position.castling] ^ ZOBRIST_BLACK ^ ep_key(position)
+    return PIECES[captured]
+
+def unmake_move(position):
+    move, captured, captured_sq, castling, ep_square, key, halfmove = position.history.pop()
+    from_sq, to_sq, promotion = move
+    board, bitboards, occupancy = position.board, position.bitboards, position.occupancy
+    player = 1 - position.turn
+    position.turn = player
+    position.castling = castling
+    position.ep_square = ep_square
+    position.halfmove = halfmove
+    if player == 1:
+        position.fullmove -= 1
+
+    code = board[to_sq]
+    from_bit, to_bit = 1 << from_sq, 1 << to_sq
+    bitboards[code - 1] ^= to_bit
+    if promotion is not None:
+        position.piece_counts[code - 1] -= 1
+        position.material[player] -= CODE_VALUES[code] - PIECE_VALUES[0]
+        code = 1 + player*6  # back to a pawn
+        position.piece_counts[code - 1] += 1
+    bitboards[code - 1] |= from_bit
+    occupancy[player] ^= from_bit | to_bit
+    board[to_sq] = EMPTY
+    board[from_sq] = code
+    if captured:
+        bit = 1 << captured_sq
+        bitboards[captured - 1] |= bit
+        occupancy[1 - player] |= bit
+        position.piece_counts[captured - 1] += 1
+        position.material[1 - player] += CODE_VALUES[captured]
+        board[captured_sq] = captured
+
+    is_king = code == 2 + player*6
+    if is_king:
+        position.king_squares[player] = from_sq
+    if is_king and abs(to_sq - from_sq) == 2:
+        if to_sq > from_sq:
+            position.put_piece(to_sq + 1, position.remove_piece(to_sq - 1))
+        else:
+            position.put_piece(to_sq - 2, position.remove_piece(to_sq + 1))
+    position.key = key
+
+
+# ---------- Movement functions ----------
+# Each generator returns a bitboard of pseudo-legal target squares for the piece on sq.
+def pawn_movement(position, sq, player):
+    occupied = position.occupied()
+    forward = sq - 8 if player == 0 else sq + 8
+    targets = 0
+    if 0 <= forward <= 63 and not occupied >> forward & 1:
+        targets |= 1 << forward
+        start_row = 6 if player == 0 else 1
+        if sq >> 3 == start_row:
+            forward2 = sq - 16 if player == 0 else sq + 16
+            if not occupied >> forward2 & 1:
+                targets |= 1 << forward2
+    enemies = position.occupancy[1 - player]
+    if position.ep_square is not None:
+        enemies |= 1 << position.ep_square
+    return targets | (PAWN_ATTACKS[player][sq] & enemies)
+
+def king_movement(position, sq, player):
+    targets = KING_ATTACKS[sq] & ~position.occupancy[player]
+
+    # castling: right still held, rook at home, squares between empty, king not passing through check
+    start_row = 7 if player == 0 else 0
+    rights = position.castling >> (player*2) & 3
+    if not rights or sq != start_row*8 + 4:
+        return targets
+    occupied = position.occupied()
+    rooks = position.bitboards[player*6 + 4]
+    for right, rook_col, empty_cols, safe_cols, king_col in ((1, 7, (5, 6), (4, 5, 6), 6), (2, 0, (1, 2, 3), (4, 3, 2), 2)):
+        if not rights & right or not rooks >> (start_row*8 + rook_col) & 1:
+            continue
+        if any(occupied >> (start_row*8 + col) & 1 for col in empty_cols):
+            continue
+        if any(is_square_attacked(position, start_row*8 + col, 1 - player) for col in safe_cols):
+            continue
+        targets |= 1 << (start_row*8 + king_col)
+    return targets
+
+def bishop_movement(position, sq, player):
+    return bishop_attacks(sq, position.occupied()) & ~position.occupancy[player]
+
+def rook_movement(position, sq, player):
+    return rook_attacks(sq, position.occupied()) & ~position.occupancy[player]
+
+def knight_movement(position, sq, player):
+    return KNIGHT_ATTACKS[sq] & ~position.occupancy[player]
+
+def queen_movement(position, sq, player):
+    return rook_movement(position, sq, player) | bishop_movement(position, sq, player)
+
+movement_functions = {0: pawn_movement, 1: king_movement, 2: queen_movement, 3: bishop_movement, 4: rook_movement, 5: knight_movement}
+
+
+# ---------- Check / legal move detection ----------
+def is_check_simulate(player, position):
+    king_sq = position.king_squares[player]
+    if king_sq is None:
+        return False
+    return is_square_attacked(position, king_sq, 1 - player)
+
+def legal_moves(position):
+    # checkers and pins are computed once; every move is then filtered by masks instead of being played out
+    us, them = position.turn, 1 - position.turn
+    board, bitboards = position.board, position.bitboards
+    own, enemy = position.occupancy[us], position.occupancy[them]
+    occupied = own | enemy
+    king_sq = position.king_squares[us]
+    moves = []
+
+    check_mask = ~0
+    pinned = 0
+    pin_lines = {}
+    if king_sq is not None:
+        # king steps: the king itself must not shield the square it steps to
+        without_king = occupied ^ (1 << king_sq)
+        for to_sq in bit_squares(KING_ATTACKS[king_sq] & ~own):
+            if not attackers_to(position, to_sq, them, without_king):
+                moves.append((king_sq, to_sq, None))
+        checkers = attackers_to(position, king_sq, them, occupied)
+        if checkers:
+            if checkers & (checkers - 1):
+                return moves  # double check: only the king may move
+            check_mask = checkers | BETWEEN[king_sq][checkers.bit_length() - 1]
+        else:
+            for to_sq in bit_squares(king_movement(position, king_sq, us) & ~KING_ATTACKS[king_sq]):
+                moves.append((king_sq, to_sq, None))  # castling
+
+        queens = bitboards[them*6 + 2]
+        snipers = ((rook_attacks(king_sq, 0) & (bitboards[them*6 + 4] | queens))
+                   | (bishop_attacks(king_sq, 0) & (bitboards[them*6 + 3] | queens)))
+        for sniper in bit_squares(snipers):
+            blockers = BETWEEN[king_sq][sniper] & occupied
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pinned |= blockers
+                pin_lines[blockers.bit_length() - 1] = LINE[king_sq][sniper]
+
+    for sq in bit_squares(own):
+        ptype = (board[sq] - 1) % 6
+        if ptype == 1 and sq == king_sq:
+            continue
+        targets = movement_functions[ptype](position, sq, us)
+        if pinned >> sq & 1:
+            targets &= pin_lines[sq]
+        if ptype != 0:
+            for to_sq in bit_squares(targets & check_mask):
+                moves.append((sq, to_sq, None))
+            continue
+        ep_square = position.ep_square
+        for to_sq in bit_squares(targets):
+            if to_sq == ep_square:
+                captured_sq = to_sq + 8 if us == 0 else to_sq - 8
+                if not (check_mask >> to_sq & 1 or check_mask >> captured_sq & 1):
+                    continue
+                if king_sq is not None:
+                    # both pawns leave the rank at once, which can expose the king to a slider
+                    after = occupied ^ (1 << sq) ^ (1 << captured_sq) | (1 << to_sq)
+                    queens = bitboards[them*6 + 2]
+                    if (rook_attacks(king_sq, after) & (bitboards[them*6 + 4] | queens)
+                            or bishop_attacks(king_sq, after) & (bitboards[them*6 + 3] | queens)):
+                        continue
+                moves.append((sq, to_sq, None))
+            elif check_mask >> to_sq & 1:
+                if to_sq >> 3 in (0, 7):
+                    for promotion in (2, 4, 3, 5):
+                        moves.append((sq, to_sq, promotion))
+                else:
+                    moves.append((sq, to_sq, None))
+    return moves
+
+def in_check(position):
+    return is_check_simulate(position.turn, position)
+
+def legal_targets(position, sr, sc):
+    sq = sr*8 + sc
+    return sorted({divmod(to_sq, 8) for from_sq, to_sq, promotion in legal_moves(position) if from_sq == sq})
+
+def has_legal_moves(position):
+    return bool(legal_moves(position))
+
+def check_valid(position, sr, sc, er, ec):
+    return (er, ec) in legal_targets(position, sr, sc)
+
+def is_repetition(position, count=3):
+    # compares keys of earlier positions with the same side to move, back to the last capture or
+    # pawn move (nothing before it can repeat)
+    history = position.history
+    key = position.key
+    seen = 1
+    for i in range(2, min(position.halfmove, len(history)) + 1, 2):
+        if history[-i][5] == key:
+            seen += 1
+            if seen >= count:
+                return True
+    return False
+
+def is_fifty_move_draw(position):
+    return position.halfmove >= 100
+
+def insufficient_material(position):
+    # read straight off the incremental piece counts (indexed player*6 + type):
+    # 0 = pawn, 1 = king, 2 = queen, 3 = bishop, 4 = rook, 5 = knight
+    counts = position.piece_counts
+    minors = [0, 0]
+    for player in [0, 1]:
+        base = player*6
+        if counts[base] or counts[base + 2] or counts[base + 4]:
+            return False  # a pawn, queen or rook → checkmate still possible
+        minors[player] = counts[base + 3] + counts[base + 5]
+    # King vs King, King + minor vs King, King + minor vs King + minor
+    return minors[0] <= 1 and minors[1] <= 1
+
+
+# ---------- Notation ----------
+piece_map = {
+    (0, 0): 'P', (0, 1): 'K', (0, 2): 'Q', (0, 3): 'B', (0, 4): 'R', (0, 5): 'N',
+    (1, 0): 'p', (1, 1): 'k', (1, 2): 'q', (1, 3): 'b', (1, 4): 'r', (1, 5): 'n'
+}
+
+def algebraic_to_coords(square):
+    # 'a1' -> (7,0), 'e2' -> (6,4) etc. (rank 1 is bottom row -> index 7)
+    if len(square) != 2: return None
+    file = square[0]
+    rank = square[1]
+    if not ('a' <= file <= 'h' and '1' <= rank <= '8'): return None
+    c = ord(file) - ord('a')
+    r = 8 - int(rank)
+    return (r, c)
+
+def square_name(sq):
+    # 52 -> 'e2'
+    return 'abcdefgh'[sq & 7] + str(8 - (sq >> 3))
+
+def move_to_uci(move):
+    # (52, 36, None) -> 'e2e4', promotions get the lower-case piece letter
+    from_sq, to_sq, promotion = move
+    suffix = piece_types[promotion].lower() if promotion is not None else ''
+    return square_name(from_sq) + square_name(to_sq) + suffix
+
+def move_from_uci(position, move_str):
+    # 'e2e4' -> the matching legal move tuple, or None if it is not legal here
+    for move in legal_moves(position):
+        if move_to_uci(move) == move_str:
+            return move
+    return None
+
+def position_from_fen(fen):
+    fields = fen.split()
+    board = bytearray(64)
+    letters = {letter: piece_code(piece) for piece, letter in piece_map.items()}
+    for r, fen_row in enumerate(fields[0].split('/')):
+        c = 0
+        for char in fen_row:
+            if char.isdigit():
+                c += int(char)
+            else:
+                board[r*8 + c] = letters[char]
+                c += 1
+    turn = 0 if len(fields) < 2 or fields[1] == 'w' else 1
+    castling = 0
+    if len(fields) > 2:
+        for bit, flag in ((1, 'K'), (2, 'Q'), (4, 'k'), (8, 'q')):
+            if flag in fields[2]:
+                castling |= bit
+    ep_square = None
+    if len(fields) > 3 and fields[3] != '-':
+        r, c = algebraic_to_coords(fields[3])
+        ep_square = r*8 + c
+    halfmove = int(fields[4]) if len(fields) > 4 else 0
+    fullmove = int(fields[5]) if len(fields) > 5 else 1
+    return Position(board, turn, castling, ep_square, halfmove, fullmove)
+
+def board_to_fen(position):
+    fen_rows = []
+    board = position.board
+    for r in range(8):
+        empty = 0
+        fen_row = ''
+        for code in board[r*8:r*8 + 8]:
+            if not code:
+                empty += 1
+            else:
+                if empty:
+                    fen_row += str(empty)
+                    empty = 0
+                fen_row += piece_map.get(PIECES[code], '?')
+        if empty:
+            fen_row += str(empty)
+        fen_rows.append(fen_row)
+    fen_board = '/'.join(fen_rows)
+
+    castling = ''.join(flag for bit, flag in ((1, 'K'), (2, 'Q'), (4, 'k'), (8, 'q')) if position.castling & bit)
+    if castling == '':
+        castling = '-'
+    en_passant = square_name(position.ep_square) if position.ep_square is not None else '-'
+
+    turn_char = 'w' if position.turn == 0 else 'b'
+    return f"{fen_board} {turn_char} {castling} {en_passant} {position.halfmove} {position.fullmove}"
+
+
+# ---------- Game ----------
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+MOVE_CACHE_SIZE = 4  # positions whose legal moves a Game remembers: the current one and its undo neighbours
+
+class Game:
+    # all state of one game lives here (module-level tables are read-only), so many games can be
+    # held and played side by side, one per thread if need be
+    __slots__ = ('custom_board', 'move_cache', 'position', 'start_fen', 'redo_stack', 'moves')
+
+    def __init__(self, custom_board=None):
+        self.custom_board = custom_board
+        self.move_cache = OrderedDict()  # position key -> legal moves, least recently used first
+        self.reset()
+
+    def reset(self):
+        board = create_board(self.custom_board)
+        self.position = Position(board, castling=castling_from_board(board))
+        self.start_fen = board_to_fen(self.position)
+        # the position's own undo records are the move history; undo/redo step through them with
+        # unmake_move/make_move instead of keeping a board snapshot per ply
+        self.redo_stack = []  # moves taken back, most recent last
+        self.moves = []       # UCI strings of the moves played since start_fen
+
+    @property
+    def board(self):
+        return self.position.board
+
+    def piece_at(self, r, c):
+        # (player, type) or False, for callers working in rows and columns
+        return PIECES[self.position.board[r*8 + c]]
+
+    @property
+    def turn(self):
+        return self.position.turn
+
+    @property
+    def key(self):
+        return self.position.key
+
+    def legal_moves(self):
+        # generated once per position; redraws, clicks and status checks all read the cached list
+        key = self.position.key
+        moves = self.move_cache.get(key)
+        if moves is None:
+            moves = legal_moves(self.position)
+            self.move_cache[key] = moves
+            if len(self.move_cache) > MOVE_CACHE_SIZE:
+                self.move_cache.popitem(last=False)
+        else:
+            self.move_cache.move_to_end(key)
+        return moves
+
+    def legal_targets(self, sr, sc):
+        sq = sr*8 + sc
+        targets = []
+        for from_sq, to_sq, promotion in self.legal_moves():
+            if from_sq == sq and promotion in (None, 2):  # one entry per square, not per promotion piece
+                targets.append(divmod(to_sq, 8))
+        return targets
+
+    def is_legal(self, sr, sc, er, ec):
+        return (er, ec) in self.legal_targets(sr, sc)
+
+    def is_promotion(self, sr, sc, er):
+        piece = self.piece_at(sr, sc)
+        return bool(piece) and piece[1] == 0 and er in (0, 7)
+
+    def play(self, sr, sc, er, ec, promotion=None):
+        # applies a move without validating it; returns the captured piece (or False)
+        self.redo_stack.clear()  # clear redo history whenever a new move happens
+
+        if not self.is_promotion(sr, sc, er):
+            promotion = None
+        elif promotion is None:
+            promotion = 2  # default to a queen
+        move = (sr*8 + sc, er*8 + ec, promotion)
+        self.moves.append(move_to_uci(move))
+        return make_move(self.position, move)
+
+    def play_uci(self, move_str):
+        # 'e2e4', 'e7e8q' -> returns (er, ec, captured) or None if the move is not legal here
+        move = move_from_uci(self.position, move_str)
+        if move is None:
+            # unknown or illegal move (engine and internal board out-of-sync)
+            return None
+        from_sq, to_sq, promotion = move
+        sr, sc = divmod(from_sq, 8)
+        er, ec = divmod(to_sq, 8)
+        return er, ec, self.play(sr, sc, er, ec, promotion)
+
+    def undo(self):
+        if not self.position.history:
+            return False
+        self.redo_stack.append(self.position.history[-1][0])
+        unmake_move(self.position)
+        self.moves.pop()
+        return True
+
+    def redo(self):
+        if not self.redo_stack:
+            return False
+        move = self.redo_stack.pop()
+        make_move(self.position, move)
+        self.moves.append(move_to_uci(move))
+        return True
+
+    def uci_position(self, *extra_moves):
+        # argument for the UCI 'position' command: the start position plus every move played,
+        # so the engine sees the real game history instead of a freshly built FEN
+        moves = self.moves + list(extra_moves)
+        base = 'startpos' if self.start_fen == START_FEN else f'fen {self.start_fen}'
+        return f"{base} moves {' '.join(moves)}" if moves else base
+
+    def in_check(self):
+        return in_check(self.position)
+
+    def status(self):
+        # None while the game goes on, otherwise 'checkmate', 'stalemate', 'insufficient',
+        # 'repetition' (threefold) or 'fifty-move'
+        if not self.legal_moves():
+            return 'checkmate' if self.in_check() else 'stalemate'
+        if insufficient_material(self.position):
+            return 'insufficient'
+        if is_repetition(self.position):
+            return 'repetition'
+        if is_fifty_move_draw(self.position):
+            return 'fifty-move'
+        return None
@@ -0,0 +1,317 @@
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from rules import make_move, unmake_move, move_from_uci
+
+STOCKFISH_PATH = "/opt/homebrew/bin/stockfish"
+if not os.path.exists(STOCKFISH_PATH):
+    STOCKFISH_PATH = shutil.which("stockfish") or STOCKFISH_PATH
+
+
+HANDSHAKE_TIMEOUT = 10.0   # seconds to wait for uciok / readyok
+SEARCH_TIMEOUT = 10.0      # seconds past its time budget before a silent search counts as a hung engine
+MAX_RESTARTS = 3           # respawns allowed within RESTART_WINDOW seconds
+RESTART_WINDOW = 60.0
+
+
+class EngineError(RuntimeError):
+    pass
+
+
+# ---------- Stockfish integration ----------
+# A daemon thread owns the engine's stdout. Every "go" gets a Future that the reader resolves when
+# the matching "bestmove" arrives, so the caller (the Tk loop) never blocks on readline. Searches
+# are answered in the order they were started, and a stopped search still ends with a bestmove,
+# which keeps the pairing intact.
+# With pondering on, the engine keeps searching the reply it expects while the player thinks;
+# if that reply is played the search is converted with ponderhit, otherwise it is stopped.
+# Every wait has a deadline. When the engine exits or hangs, pending searches fail with
+# EngineError and the next search respawns the process, up to MAX_RESTARTS per RESTART_WINDOW.
+class StockfishAI:
+    def __init__(self, difficulty="Medium", path=STOCKFISH_PATH):
+        self.path = path
+        self.proc = None
+        self.difficulty = difficulty
+        self.depth = 8  # default, will be overridden; a cap, the move time is the real limit
+        self.movetime = 1000  # milliseconds per move
+        self.ponder = False
+        self.ponder_move = None      # reply the engine expected after its last move
+        self.ponder_search = None    # (key of the expected position, Future) while pondering
+        self.searches = deque()      # Futures waiting for a bestmove, oldest first
+        self.lines = queue.Queue()   # handshake replies (uciok, readyok, ...)
+        self.lock = threading.Lock()
+        self.restart_lock = threading.Lock()  # one respawn at a time
+        self.restarts = deque()      # times of recent respawns
+        if not self.path or not os.path.exists(self.path):
+            found = shutil.which("stockfish")
+            if found:
+                self.path = found
+        self.launch()
+
+    def launch(self):
+        # spawn the engine and bring it to readyok; raises EngineError on failure
+        try:
+            self.proc = subprocess.Popen(
+                [self.path],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                universal_newlines=True,
+                bufsize=1
+            )
+        except (OSError, TypeError) as e:
+            self.proc = None
+            raise EngineError(f"cannot start {self.path}: {e}")
+        # each process gets its own queues, so a dying reader never touches its successor's searches
+        self.searches = deque()
+        self.lines = queue.Queue()
+        reader = threading.Thread(target=self.read_output, args=(self.proc, self.searches, self.lines), daemon=True)
+        reader.start()
+        try:
+            self.send_command("uci")
+            self.wait_for("uciok")
+            self.send_command("isready")
+            self.wait_for("readyok")
+        except EngineError:
+            self.kill()
+            raise
+        # set initial difficulty
+        self.set_difficulty(self.difficulty)
+
+    def restart(self):
+        now = time.monotonic()
+        while self.restarts and now - self.restarts[0] > RESTART_WINDOW:
+            self.restarts.popleft()
+        if len(self.restarts) >= MAX_RESTARTS:
+            raise EngineError("engine keeps failing, not restarting")
+        self.restarts.append(now)
+        self.kill()
+        print("[INFO] Restarting Stockfish.")
+        self.launch()
+
+    def can_restart(self):
+        now = time.monotonic()
+        return sum(1 for t in self.restarts if now - t <= RESTART_WINDOW) < MAX_RESTARTS
+
+    def engine_alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def send_command(self, cmd):
+        if not self.engine_alive(): return
+        try:
+            self.proc.stdin.write(cmd + "\n")
+            self.proc.stdin.flush()
+        except Exception:
+            pass
+
+    def read_output(self, proc, searches, lines):
+        # runs on the reader thread; readline blocks in the OS and returns "" once, at EOF
+        for line in proc.stdout:
+            line = line.strip()
+            if line.startswith("bestmove"):
+                parts = line.split()
+                move = parts[1] if len(parts) >= 2 and parts[1] != "(none)" else None
+                self.ponder_move = parts[3] if len(parts) >= 4 and parts[2] == "ponder" else None
+                with self.lock:
+                    search = searches.popleft() if searches else None
+                if search:
+                    search.set_result(move)
+            elif line and not line.startswith("info"):
+                lines.put(line)
+        # engine gone: reap it so engine_alive() sees the exit, then fail anyone still waiting
+        try:
+            proc.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        with self.lock:
+            pending = list(searches)
+            searches.clear()
+        for search in pending:
+            search.set_exception(EngineError("engine exited during search"))
+        lines.put(None)
+
+    def wait_for(self, token, timeout=HANDSHAKE_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                line = self.lines.get(timeout=max(remaining, 0))
+            except queue.Empty:
+                raise EngineError(f"no {token} within {timeout:g}s")
+            if line is None:
+                raise EngineError(f"engine exited before {token}")
+            if line == token:
+                return
+
+    def go_command(self, clock=None, ponder=False):
+        # clock = (wtime, btime, winc, binc) in milliseconds for games with real clocks;
+        # otherwise every move gets the fixed movetime budget. The depth caps both.
+        parts = ["go"]
+        if ponder:
+            parts.append("ponder")
+        if clock:
+            wtime, btime, winc, binc = clock
+            parts.append(f"wtime {wtime} btime {btime} winc {winc} binc {binc}")
+        else:
+            parts.append(f"movetime {self.movetime}")
+        parts.append(f"depth {self.depth}")
+        return " ".join(parts)
+
+    def time_budget(self, clock=None):
+        # seconds the engine may legitimately spend on one move
+        return (max(clock[0], clock[1]) if clock else self.movetime) / 1000
+
+    def start_search(self, game, clock=None):
+        # returns a Future resolved with the engine's move in UCI notation (None if there is none),
+        # or failed with EngineError if the engine could not be (re)started or died mid-search.
+        # The engine gets the game's start position and move list, which keeps its repetition
+        # history and en passant state exact.
+        search = self.resume_ponder(game.position)
+        if search is not None:
+            self.watch(search, self.time_budget(clock))
+            return search
+        search = Future()
+        command = f"position {game.uci_position()}"
+        if self.engine_alive():
+            self.send_search(search, command, clock)
+        else:
+            # respawning blocks on the handshake, so like start_in_background it runs on a worker thread
+            threading.Thread(target=self.restart_and_search, args=(search, command, clock), daemon=True).start()
+        return search
+
+    def send_search(self, search, command, clock):
+        with self.lock:
+            self.searches.append(search)
+        self.send_command(command)
+        self.send_command(self.go_command(clock))
+        self.watch(search, self.time_budget(clock))
+
+    def restart_and_search(self, search, command, clock):
+        # worker thread: a second search arriving mid-respawn waits here and finds the engine alive
+        try:
+            with self.restart_lock:
+                if not self.engine_alive():
+                    self.restart()
+        except EngineError as e:
+            search.set_exception(e)
+            return
+        self.send_search(search, command, clock)
+
+    def start_ponder(self, game, clock=None):
+        # called after the engine's move has been played: search the expected reply in the background
+        self.ponder_search = None
+        if not self.ponder or not self.ponder_move or not self.engine_alive():
+            return
+        position = game.position
+        move = move_from_uci(position, self.ponder_move)
+        if move is None:
+            return
+        make_move(position, move)
+        expected_key = position.key
+        unmake_move(position)
+        search = Future()
+        with self.lock:
+            self.searches.append(search)
+        self.send_command(f"position {game.uci_position(self.ponder_move)}")
+        self.send_command(self.go_command(clock, ponder=True))
+        self.ponder_search = (expected_key, search)
+
+    def resume_ponder(self, position):
+        # the ponder search becomes the real one if the player made the expected move
+        if self.ponder_search is None:
+            return None
+        expected_key, search = self.ponder_search
+        self.ponder_search = None
+        if expected_key == position.key and not search.done():
+            self.send_command("ponderhit")
+            return search
+        self.send_command("stop")  # missed: its bestmove is left to the discarded Future
+        return None
+
+    def watch(self, search, budget):
+        # watchdog: a search that overruns its budget by SEARCH_TIMEOUT means a hung engine;
+        # killing it fails the Future
+        proc = self.proc
+        watchdog = threading.Timer(budget + SEARCH_TIMEOUT, self.search_timed_out, args=(search, proc))
+        watchdog.daemon = True
+        watchdog.start()
+        search.add_done_callback(lambda _: watchdog.cancel())
+
+    def search_timed_out(self, search, proc):
+        if not search.done():
+            print("[ERROR] Stockfish did not answer in time, killing it.")
+            proc.kill()
+
+    def new_game(self):
+        # clears the engine's hash and history between games; a dead engine is fresh once respawned
+        self.stop()
+        self.send_command("ucinewgame")
+
+    def stop(self):
+        # ends the current or ponder search early; its Future still receives the engine's bestmove
+        self.ponder_search = None
+        self.send_command("stop")
+
+    def get_ai_move(self, game):
+        # blocking form for callers without an event loop
+        return self.start_search(game).result()
+
+    def set_difficulty(self, level):
+        if not self.engine_alive():
+            return
+
+        self.difficulty = level
+        self.send_command("setoption name UCI_LimitStrength value true")  # enable skill limiting
+        self.ponder = level != "Easy"  # pondering pays off once searches take noticeable time
+        self.send_command(f"setoption name Ponder value {'true' if self.ponder else 'false'}")
+
+        # each level is a response-time budget; the depth only caps easy positions
+        if level == "Easy":
+            self.send_command("setoption name Skill Level value 4")  # weak
+            self.depth = 4
+            self.movetime = 300
+        elif level == "Medium":
+            self.send_command("setoption name Skill Level value 8")  # moderate
+            self.depth = 8
+            self.movetime = 1000
+        elif level == "Hard":
+            self.send_command("setoption name Skill Level value 20")  # strong
+            self.depth = 20
+            self.movetime = 2500
+
+    def kill(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait()
+        self.proc = None
+
+    def quit(self):
+        if not self.engine_alive():
+            self.proc = None
+            return
+        self.send_command("quit")
+        try:
+            self.proc.wait(timeout=0.5)
+        except subprocess.TimeoutExpired:
+            self.kill()
+        self.proc = None
+
+
+def start_in_background(difficulty="Medium", path=STOCKFISH_PATH):
+    # spawns the engine and runs its handshake on a worker thread; the Future resolves to the
+    # ready StockfishAI or fails with EngineError
+    startup = Future()
+    def launch():
+        try:
+            startup.set_result(StockfishAI(difficulty, path))
+        except Exception as e:
+            startup.set_exception(e)
+    threading.Thread(target=launch, daemon=True).start()
+    return startup